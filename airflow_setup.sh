@@ -14,6 +14,9 @@ airflow users create \
 # Initialize Airflow DB
 airflow db init
 
+# Slots shared by the DAG's per-ticker retrain and evaluate tasks
+airflow pools set stock_forecaster_tickers "${MAX_ACTIVE_TICKERS:-4}" "Ticker branches running at once"
+
 # Start Airflow webserver and scheduler
 airflow webserver --port 8080 &
 airflow scheduler & 
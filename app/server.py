@@ -1,23 +1,635 @@
-from datetime import datetime
-import pickle
-from fastapi import FastAPI, Query
-from fastapi.responses import HTMLResponse
+import time
+
+IMPORT_START = time.perf_counter()
+
+import asyncio
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+import hashlib
+import html
+import json
+import multiprocessing
+import sys
+import threading
+import numpy as np
+from fastapi import FastAPI, Query, Response
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
 
 import os
-app = FastAPI()
+from artifact import model_from_bytes, resolve_model_path
+from prediction import TrendDraws, last_train_date, predict_dates
+from tickers import MODEL_DIR, discover_tickers, is_valid_ticker, model_path
+from instrumentation import (
+    PROFILING_ENABLED, instrumented, mark_process_dead, metrics_payload, profiler, record_cache, record_model_load,
+    timed
+)
+
+IMPORT_SECONDS = time.perf_counter() - IMPORT_START
+
+FORECAST_CACHE_HORIZON = int(os.environ.get("FORECAST_CACHE_HORIZON", 365))
+FORECAST_CACHE_SIZE = int(os.environ.get("FORECAST_CACHE_SIZE", 4096))
+# 0 predicts in the server process; N > 0 predicts in N worker processes
+PREDICT_WORKERS = int(os.environ.get("PREDICT_WORKERS", 0))
+PREDICT_QUEUE_SIZE = int(os.environ.get("PREDICT_QUEUE_SIZE", max(PREDICT_WORKERS, 1) * 16))
+FORECAST_RANGE_BLOCK = int(os.environ.get("FORECAST_RANGE_BLOCK", 64))
+FORECAST_RANGE_MAX_DAYS = int(os.environ.get("FORECAST_RANGE_MAX_DAYS", 3650))
+# Upper bound on the per-request sample count for uncertainty intervals
+FORECAST_MAX_SAMPLES = int(os.environ.get("FORECAST_MAX_SAMPLES", 5000))
+# Upper bound on one model's cached interval draws (samples times reach)
+FORECAST_DRAWS_MAX_BYTES = int(float(os.environ.get("FORECAST_DRAWS_MAX_MB", 64)) * 1024 * 1024)
+# Load and pre-predict every prod model at startup before /ready passes
+STARTUP_WARMUP = os.environ.get("STARTUP_WARMUP", "0") == "1"
+MODEL_MEMORY_BUDGET = int(float(os.environ.get("MODEL_MEMORY_BUDGET_MB", 512)) * 1024 * 1024)
+
+
+class LoadedModel:
+    """A prod model held in memory together with the artifact it came from and its interval draws."""
+
+    def __init__(self, ticker, model, path, version, stat_key, n_bytes):
+        self.ticker = ticker
+        self.model = model
+        # Drawn with the forecast table and dropped with the model. Seeded by
+        # the artifact, so every process serving this version gives the same intervals
+        self.draws = TrendDraws(model, seed=int(version[:16], 16), max_bytes=FORECAST_DRAWS_MAX_BYTES)
+        self.path = path
+        self.version = version
+        self.stat_key = stat_key
+        # Artifact size plus whatever was built from the model (draws, forecast table)
+        self.n_bytes = n_bytes
+        self.parts = {}
+        self.loaded_at = datetime.now()
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of prod models, loaded lazily and kept in an LRU.
+
+    Any ticker with a prod model in `model_dir` can be served; nothing is
+    loaded until its first request. Models come from the compact .npz
+    artifact when one sits next to the pickle, and are reloaded only when the
+    file on disk changes (mtime or size). A reload builds a new LoadedModel
+    and swaps it in, so requests already holding the previous entry finish
+    against the model they started with.
+
+    Resident models are bounded by `memory_budget` bytes: each model counts
+    its artifact size plus what is built from it later (interval draws, the
+    forecast table), charged through charge() as those grow. Going past the
+    budget evicts the least recently used models and calls each `on_evict`
+    callback with the ticker, so caches keyed by ticker can drop their
+    entries too.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, memory_budget=MODEL_MEMORY_BUDGET):
+        self.model_dir = model_dir
+        self.memory_budget = memory_budget
+        self.total_bytes = 0
+        self.on_evict = []
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._listing = (None, [])
+
+    def tickers(self):
+        """
+        Return every ticker with a prod model, re-listing the directory only when it changes.
+
+        Returns:
+            list: Sorted ticker symbols.
+        """
+        try:
+            mtime = os.stat(self.model_dir).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        if self._listing[0] != mtime:
+            self._listing = (mtime, discover_tickers(self.model_dir))
+        return self._listing[1]
+
+    def get(self, ticker):
+        """
+        Return the current LoadedModel for a ticker, loading or reloading it if needed.
+
+        Args:
+            ticker (str): Stock ticker symbol.
+
+        Returns:
+            LoadedModel: The loaded model, or None if no artifact exists for the ticker.
+        """
+        if not is_valid_ticker(ticker):
+            return None
+        path = resolve_model_path(model_path(ticker, self.model_dir))
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(ticker)
+            if entry is not None and entry.stat_key == stat_key:
+                self._entries.move_to_end(ticker)
+                return entry
+        # Loads of different tickers run in parallel; loads of one ticker do not
+        with self._load_locks.setdefault(ticker, threading.Lock()):
+            # Another request may have reloaded the file while we waited
+            entry = self._entries.get(ticker)
+            if entry is not None and entry.stat_key == stat_key:
+                return entry
+            with timed("model_load"):
+                with open(path, "rb") as f:
+                    payload = f.read()
+                model = model_from_bytes(payload, path)
+            record_model_load(ticker, len(payload))
+            version = hashlib.sha256(payload).hexdigest()[:12]
+            entry = LoadedModel(ticker, model, path, version, stat_key, len(payload))
+            self._insert(entry)
+        return entry
+
+    def _insert(self, entry):
+        with self._lock:
+            previous = self._entries.pop(entry.ticker, None)
+            if previous is not None:
+                self.total_bytes -= previous.n_bytes
+            self._entries[entry.ticker] = entry
+            self.total_bytes += entry.n_bytes
+            evicted = self._evict_over_budget()
+        self._notify_evicted(evicted)
+
+    def charge(self, entry, part, n_bytes):
+        """
+        Set the memory held by one part built from a model and evict past the budget.
+
+        Args:
+            entry (LoadedModel): Model the memory belongs to.
+            part (str): What holds it, e.g. "draws" or "table"; charging a part again replaces its size.
+            n_bytes (int): Current size of the part.
+        """
+        with self._lock:
+            change = n_bytes - entry.parts.get(part, 0)
+            entry.parts[part] = n_bytes
+            entry.n_bytes += change
+            # A replaced or evicted model no longer counts towards the budget
+            if self._entries.get(entry.ticker) is not entry:
+                return
+            self.total_bytes += change
+            self._entries.move_to_end(entry.ticker)
+            evicted = self._evict_over_budget()
+        self._notify_evicted(evicted)
+
+    def _evict_over_budget(self):
+        # Always keep the most recent model, even if it alone exceeds the budget
+        evicted = []
+        while self.total_bytes > self.memory_budget and len(self._entries) > 1:
+            ticker, old = self._entries.popitem(last=False)
+            self.total_bytes -= old.n_bytes
+            evicted.append(ticker)
+        return evicted
+
+    def _notify_evicted(self, evicted):
+        for ticker in evicted:
+            for callback in self.on_evict:
+                callback(ticker)
+
+    def versions(self):
+        """
+        Return the version of every model currently held in memory.
+
+        Returns:
+            dict: Mapping of ticker to model version and load metadata.
+        """
+        return {
+            ticker: {
+                "version": entry.version,
+                "path": entry.path,
+                "loaded_at": entry.loaded_at.isoformat(timespec="seconds")
+            }
+            for ticker, entry in list(self._entries.items())
+        }
+
+    def is_full(self):
+        return self.total_bytes >= self.memory_budget
+
+
+def _table_bytes(table):
+    # The dict plus its datetime keys and (yhat, lower, upper) float tuples
+    if not table:
+        return sys.getsizeof(table)
+    key, value = next(iter(table.items()))
+    per_item = sys.getsizeof(key) + sys.getsizeof(value) + sum(sys.getsizeof(number) for number in value)
+    return sys.getsizeof(table) + len(table) * per_item
+
+
+class ForecastCache:
+    """
+    Memoise predictions and their intervals per (ticker, model version, date).
+
+    The first request against a model version predicts the next `horizon` days
+    with their uncertainty intervals in one pass and keeps them as a dict, so
+    most queries are a lookup. Dates beyond the horizon, and requests for a
+    non-default sample count, are predicted on demand and kept in a bounded
+    LRU. When the registry hands over a new version for a ticker, that
+    ticker's table and LRU entries are dropped. Each `on_grow` callback is
+    called with (entry, part, n_bytes) when the table or the model's interval
+    draws change size, so the registry can count them against its budget.
+    """
+
+    def __init__(self, horizon=FORECAST_CACHE_HORIZON, max_size=FORECAST_CACHE_SIZE):
+        self.horizon = horizon
+        self.max_size = max_size
+        self.on_grow = []
+        self._tables = {}
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks = {}
+        self._discards = Counter()
+
+    def _grew(self, entry, part, n_bytes):
+        for callback in self.on_grow:
+            callback(entry, part, n_bytes)
+
+    def _table(self, entry):
+        cached = self._tables.get(entry.ticker)
+        if cached is not None and cached[0] == entry.version:
+            return cached[1]
+        # Tables of different tickers build in parallel; builds of one ticker do not
+        with self._build_locks.setdefault(entry.ticker, threading.Lock()):
+            cached = self._tables.get(entry.ticker)
+            if cached is not None and cached[0] == entry.version:
+                return cached[1]
+            discards = self._discards[entry.ticker]
+            start = np.datetime64(last_train_date(entry.model), "D")
+            dates = start + np.arange(self.horizon + 1)
+            with timed("table_build"):
+                forecast = predict_dates(entry.model, dates, uncertainty=True, draws=entry.draws)
+            table = dict(zip(
+                forecast["ds"].astype("datetime64[us]").tolist(),
+                zip(forecast["yhat"].tolist(), forecast["yhat_lower"].tolist(), forecast["yhat_upper"].tolist())
+            ))
+            with self._lock:
+                # A model evicted during the build serves this request but is not kept
+                if self._discards[entry.ticker] == discards:
+                    self._tables[entry.ticker] = (entry.version, table)
+                for key in [key for key in self._lru if key[0] == entry.ticker and key[1] != entry.version]:
+                    del self._lru[key]
+        # Outside the locks: charging may evict, and eviction calls discard()
+        self._grew(entry, "table", _table_bytes(table))
+        self._grew(entry, "draws", entry.draws.nbytes)
+        return table
+
+    def discard(self, ticker):
+        """
+        Drop the horizon table and LRU entries of a ticker whose model was evicted.
+        """
+        with self._lock:
+            self._discards[ticker] += 1
+            self._tables.pop(ticker, None)
+            for key in [key for key in self._lru if key[0] == ticker]:
+                del self._lru[key]
+
+    def get(self, entry, target_date, n_samples=None):
+        """
+        Return the predicted value and interval for a date, computing and caching them if needed.
+
+        Args:
+            entry (LoadedModel): Model to predict with.
+            target_date (datetime): Date to forecast.
+            n_samples (int): Samples for the interval; None uses the model's uncertainty_samples.
+
+        Returns:
+            tuple: (yhat, yhat_lower, yhat_upper).
+        """
+        return self.get_many(entry, [target_date], n_samples)[0]
+
+    def get_many(self, entry, target_dates, n_samples=None):
+        """
+        Return predicted values and intervals for several dates, predicting all misses in one pass.
+
+        Args:
+            entry (LoadedModel): Model to predict with.
+            target_dates (list): Dates to forecast.
+            n_samples (int): Samples for the interval; None uses the model's
+                uncertainty_samples and can be served from the horizon table.
+
+        Returns:
+            list: (yhat, yhat_lower, yhat_upper) per date, in the order requested.
+
+        Raises:
+            ValueError: If the interval would need more draws than the model may keep.
+        """
+        table = self._table(entry)
+        if n_samples is None:
+            values = [table.get(target_date) for target_date in target_dates]
+        else:
+            values = [None] * len(target_dates)
+        table_misses = values.count(None)
+        record_cache("table", len(values) - table_misses, table_misses)
+        missing = []
+        with self._lock:
+            for i, target_date in enumerate(target_dates):
+                if values[i] is not None:
+                    continue
+                key = (entry.ticker, entry.version, target_date, n_samples)
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    values[i] = self._lru[key]
+                else:
+                    missing.append(i)
+        record_cache("lru", table_misses - len(missing), len(missing))
+        if not missing:
+            return values
+        with timed("predict"):
+            forecast = predict_dates(
+                entry.model, [target_dates[i] for i in missing], uncertainty=True, draws=entry.draws,
+                n_samples=n_samples
+            )
+        predicted = zip(forecast["yhat"].tolist(), forecast["yhat_lower"].tolist(), forecast["yhat_upper"].tolist())
+        with self._lock:
+            for i, value in zip(missing, predicted):
+                values[i] = value
+                self._lru[(entry.ticker, entry.version, target_dates[i], n_samples)] = value
+            while len(self._lru) > self.max_size:
+                self._lru.popitem(last=False)
+        self._grew(entry, "draws", entry.draws.nbytes)
+        return values
+
+
+registry = ModelRegistry()
+forecast_cache = ForecastCache()
+registry.on_evict.append(forecast_cache.discard)
+forecast_cache.on_grow.append(registry.charge)
+
+
+class PoolSaturated(Exception):
+    pass
+
+
+def _preload_models():
+    """
+    Load each prod model and build its forecast table and interval draws, until the memory budget is used.
+
+    Through _warm_up_worker, also the initializer of prediction workers,
+    which each have their own registry and cache. Models past the budget load
+    on demand.
+
+    Returns:
+        dict: Seconds spent per ticker.
+    """
+    seconds = {}
+    for ticker in registry.tickers():
+        if registry.is_full():
+            break
+        with timed("warmup") as timer:
+            entry = registry.get(ticker)
+            if entry is not None:
+                forecast_cache.get_many(entry, [])
+        seconds[ticker] = timer.seconds
+    return seconds
+
+
+# Set in each prediction worker by its initializer
+_worker_load_seconds = {}
+
+
+def _warm_up_worker():
+    _worker_load_seconds.update(_preload_models())
+
+
+def _worker_started():
+    # Runs after the initializer, so the worker has finished its warm-up
+    return os.getpid(), _worker_load_seconds
+
+
+class PredictionPool:
+    """
+    Bounded dispatcher for forecast work.
+
+    With workers > 0, jobs run on a process pool whose workers each keep their
+    own ModelRegistry and ForecastCache, so CPU-bound predicts for different
+    requests run in parallel instead of contending for the GIL. With workers
+    == 0 (or before start()), jobs run on the server's thread pool as before.
+
+    With workers, a request is admitted as long as fewer than `max_pending`
+    jobs are queued or running; once the pool is full run() raises
+    PoolSaturated and the handler answers 503 so clients back off. In-process
+    requests are never rejected, only queued. An admitted request may carry
+    more jobs than `max_pending` (e.g. a large /forecast/batch); a semaphore
+    lets at most `max_pending` of them be submitted at a time and queues the
+    rest. Only the event loop thread touches the pending count, so it needs
+    no lock.
+    """
+
+    def __init__(self, workers=PREDICT_WORKERS, max_pending=PREDICT_QUEUE_SIZE):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = None
+        self._started = []
+        self._pids = set()
+        self._slots = None
+        self._slots_loop = None
+
+    def start(self, warmup=False):
+        """
+        Start the worker processes without waiting for them; see wait().
+
+        Args:
+            warmup (bool): Each worker loads every prod model (as far as the
+                memory budget allows) before it takes its first job.
+        """
+        if self.workers <= 0 or self._executor is not None:
+            return
+        # spawn, not fork: the server process already runs threads
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_up_worker if warmup else None
+        )
+        # Workers start lazily; submitting one job per worker brings them all
+        # up (and through the warm-up) before the first request arrives
+        self._started = [self._executor.submit(_worker_started) for _ in range(self.workers)]
+
+    def wait(self):
+        """
+        Block until every worker is up and has finished its warm-up.
+
+        Returns:
+            dict: Seconds spent per ticker, per worker pid.
+        """
+        load_seconds = dict(future.result() for future in self._started)
+        self._pids = set(load_seconds)
+        print(f"Started {len(self._pids)} prediction workers")
+        return load_seconds
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+            for pid in self._pids:
+                mark_process_dead(pid)
+            self._pids = set()
+
+    async def run(self, fn, calls, admitted=False):
+        """
+        Run fn once per argument tuple, concurrently, and return the results in order.
+
+        Args:
+            fn (callable): Module-level function (it may be sent to a worker process).
+            calls (list): Argument tuples, one per job.
+            admitted (bool): The jobs continue a request that was already
+                admitted (e.g. the later blocks of a streamed range), so they
+                wait for a slot instead of raising PoolSaturated.
+
+        Returns:
+            list: fn's result per call.
+        """
+        if not admitted and self._executor is not None and self.pending >= self.max_pending:
+            raise PoolSaturated()
+        self.pending += len(calls)
+        try:
+            return await asyncio.gather(*(self._submit(fn, args) for args in calls))
+        finally:
+            self.pending -= len(calls)
+
+    def _semaphore(self):
+        # A semaphore belongs to the event loop it first waits on; test
+        # clients run each session on a new loop
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_pending)
+            self._slots_loop = loop
+        return self._slots
+
+    async def _submit(self, fn, args):
+        async with self._semaphore():
+            if self._executor is None:
+                return await run_in_threadpool(fn, *args)
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+
+prediction_pool = PredictionPool()
+
+
+class StartupState:
+    """
+    Readiness flag plus a report of where startup time went.
+
+    The report covers importing this module (and through it numpy, fastapi
+    and the prediction code), starting prediction workers, and the optional
+    warm-up, per ticker. Workers start and warm-up runs in a background
+    thread so the server can answer liveness checks while /ready still
+    returns 503. With prediction workers the models are loaded in each worker
+    rather than in this process, which serves no forecasts itself.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.report = {"import_seconds": IMPORT_SECONDS}
+
+    def start(self, warmup=STARTUP_WARMUP):
+        prediction_pool.start(warmup)
+        if warmup or prediction_pool.workers > 0:
+            threading.Thread(target=self._warm_up, args=(warmup,), name="warmup", daemon=True).start()
+        else:
+            self._mark_ready()
+
+    def _warm_up(self, warmup):
+        start = time.perf_counter()
+        try:
+            if prediction_pool.workers > 0:
+                with timed("startup_workers") as timer:
+                    load_seconds = prediction_pool.wait()
+                self.report["worker_start_seconds"] = timer.seconds
+                if warmup:
+                    self.report["model_load_seconds"] = load_seconds
+            else:
+                self.report["model_load_seconds"] = _preload_models()
+        finally:
+            if warmup:
+                self.report["warmup_seconds"] = time.perf_counter() - start
+            self._mark_ready()
+
+    def _mark_ready(self):
+        self.report["ready_after_seconds"] = time.perf_counter() - IMPORT_START
+        self.ready = True
+        print(f"Server ready in {self.report['ready_after_seconds']:.2f}s")
+
+
+startup = StartupState()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    startup.start()
+    yield
+    prediction_pool.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+def saturated_response():
+    return JSONResponse(
+        status_code=503,
+        content={"error": "Server is at capacity, retry shortly"},
+        headers={"Retry-After": "1"}
+    )
+
+
+class BatchForecastRequest(BaseModel):
+    tickers: list[str]
+    forecast_dates: list[str] = Field(default_factory=list, description="Dates in YYYY-MM-DD format or ISO timestamps")
+    horizons: list[int] = Field(default_factory=list, description="Days ahead of today")
+    samples: int | None = Field(None, ge=1, le=FORECAST_MAX_SAMPLES, description="Samples for the uncertainty interval")
+
+
+def parse_forecast_date(entry, forecast_date):
+    """
+    Parse a requested date or timestamp and check it is not before the model's training data.
+
+    Models fitted on intraday bars (see streaming.py) forecast at the
+    requested time of day; for daily models a bare date means midnight.
+
+    Args:
+        entry (LoadedModel): Model the date will be forecast with.
+        forecast_date (str): Date in YYYY-MM-DD format, or an ISO timestamp such as YYYY-MM-DDTHH:MM.
+
+    Returns:
+        tuple: (target_date, None) on success, or (None, error message).
+    """
+    try:
+        target_date = datetime.fromisoformat(forecast_date)
+    except ValueError:
+        return None, "Invalid date format. Use YYYY-MM-DD or YYYY-MM-DDTHH:MM[:SS]."
+    if target_date.tzinfo is not None:
+        return None, "Timestamps must not include a UTC offset; use the exchange's local time."
+    last_date = last_train_date(entry.model)
+    if target_date < last_date:
+        return None, f"Date must be after the last date in the training data: {format_forecast_date(last_date)}"
+    return target_date, None
+
+
+def format_forecast_date(value):
+    # Daily forecasts keep the YYYY-MM-DD form; intraday ones carry the time
+    if value.time() == datetime.min.time():
+        return value.strftime("%Y-%m-%d")
+    return value.isoformat()
 
 
 @app.get("/", response_class=HTMLResponse)
 def read_root():
-    return """
+    options = "\n".join(
+        f'            <option value="{html.escape(ticker)}">{html.escape(ticker)}</option>'
+        for ticker in registry.tickers()
+    )
+    return f"""
     <h1>Stock Forecaster API</h1>
     <p>Use the <code>/forecast</code> endpoint with <b>Ticker</b> and <b>Forecast Date</b> (YYYY-MM-DD) as query parameters.</p>
     <form action="/forecast" method="get">
         <label for="ticker">Ticker:</label>
         <select id="ticker" name="ticker">
-            <option value="NVDA">NVDA</option>
-            <option value="MSFT">MSFT</option>
-            <option value="PLTR">PLTR</option>
+{options}
         </select><br>
         <label for="forecast_date">Forecast Date (YYYY-MM-DD):</label>
         <input type="text" id="forecast_date" name="forecast_date" value="2025-12-20"><br>
@@ -26,50 +638,344 @@ def read_root():
     <p style='color:red; margin-top:20px;'><strong>Disclaimer:</strong> This project and its machine learning model are for educational and informational purposes only and do not constitute financial advice. Do not use these forecasts for investment decisions.</p>
     """
 
+def forecast_ticker(ticker, forecast_dates, n_samples=None):
+    """
+    Forecast several dates with one ticker's model, with uncertainty intervals.
+
+    Runs on the prediction pool, in a worker thread or worker process, against
+    that process's registry and cache. A bad ticker or date produces an error
+    for that item only. Intervals are cached with the point forecasts; misses
+    and non-default sample counts are computed from the model's TrendDraws.
+
+    Args:
+        ticker (str): Stock ticker symbol.
+        forecast_dates (list): Dates in YYYY-MM-DD format or ISO timestamps.
+        n_samples (int): Samples for the interval; defaults to the model's uncertainty_samples.
+
+    Returns:
+        list: One result dict per date, in the order requested.
+    """
+    with profiler.capture():
+        entry = registry.get(ticker)
+        if entry is None:
+            return [
+                {"ticker": ticker, "date": forecast_date, "error": f"No model available for ticker {ticker}"}
+                for forecast_date in forecast_dates
+            ]
+        results = []
+        valid = []
+        for forecast_date in forecast_dates:
+            target_date, error = parse_forecast_date(entry, forecast_date)
+            if error:
+                results.append({"ticker": ticker, "date": forecast_date, "error": error})
+            else:
+                results.append({"ticker": ticker, "date": format_forecast_date(target_date)})
+                valid.append((results[-1], target_date))
+        try:
+            values = forecast_cache.get_many(entry, [target_date for _, target_date in valid], n_samples)
+        except ValueError as e:
+            for result, _ in valid:
+                result["error"] = str(e)
+            return results
+        for (result, _), (predicted_value, yhat_lower, yhat_upper) in zip(valid, values):
+            result["predicted_value"] = predicted_value
+            result["yhat_lower"] = yhat_lower
+            result["yhat_upper"] = yhat_upper
+            result["model_version"] = entry.version
+        return results
+
+
 @app.get("/forecast")
-def predict_stock(
+@instrumented("forecast")
+async def predict_stock(
     ticker: str = Query(..., description="Stock ticker symbol"),
-    forecast_date: str = Query(..., description="Forecast date in YYYY-MM-DD format")
+    forecast_date: str = Query(..., description="Forecast date in YYYY-MM-DD format, or an ISO timestamp"),
+    samples: int = Query(None, ge=1, le=FORECAST_MAX_SAMPLES, description="Samples for the uncertainty interval")
 ):
     """
-    Predict stock price for the given ticker and forecast date (YYYY-MM-DD).
+    Predict stock price for the given ticker and forecast date (YYYY-MM-DD or YYYY-MM-DDTHH:MM).
 
     Args:
         ticker (str): Stock ticker symbol.
-        forecast_date (str): Date to forecast in YYYY-MM-DD format.
+        forecast_date (str): Date to forecast in YYYY-MM-DD format, or an ISO timestamp for intraday models.
+        samples (int): Samples for the uncertainty interval; defaults to the model's uncertainty_samples.
+
+    Returns:
+        dict: Predicted stock price with yhat_lower and yhat_upper for the requested date, or a 503 when the
+        prediction pool is full.
+    """
+    try:
+        [[result]] = await prediction_pool.run(forecast_ticker, [(ticker, [forecast_date], samples)])
+    except PoolSaturated:
+        return saturated_response()
+    if "error" in result:
+        return {"error": result["error"]}
+    return result
+
+
+@app.post("/forecast/batch")
+@instrumented("forecast_batch")
+async def predict_stock_batch(request: BatchForecastRequest):
+    """
+    Predict stock prices for every combination of tickers and dates in one request.
+
+    Each ticker is one job on the prediction pool, so its model runs one
+    vectorized predict and different tickers run in parallel.
+
+    Args:
+        request (BatchForecastRequest): Tickers plus forecast dates and/or horizons.
+
+    Returns:
+        dict: One result per (ticker, date) pair under "results", or a 503 when the prediction pool is full.
+    """
+    today = datetime.today()
+    forecast_dates = list(request.forecast_dates)
+    forecast_dates += [(today + timedelta(days=days)).strftime("%Y-%m-%d") for days in request.horizons]
+    calls = [(ticker, forecast_dates, request.samples) for ticker in dict.fromkeys(request.tickers)]
+    try:
+        per_ticker = await prediction_pool.run(forecast_ticker, calls)
+    except PoolSaturated:
+        return saturated_response()
+    return {"results": [result for results in per_ticker for result in results]}
+
+
+RANGE_COLUMNS = ["ticker", "ds", "yhat", "yhat_lower", "yhat_upper"]
+RANGE_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def parse_range_dates(start_date, end_date, horizon):
+    """
+    Parse the dates of a range request into the daily dates it covers.
+
+    Ranges step one day at a time, so start_date and end_date are both plain
+    dates; timestamps are rejected rather than truncated.
 
     Returns:
-        dict: Predicted stock price for the requested date.
-    """
-    # Select best model file for ticker
-    model_files = {
-        "NVDA": "models/prophet_NVDA_prod.pkl",
-        "MSFT": "models/prophet_MSFT_prod.pkl",
-        "PLTR": "models/prophet_PLTR_prod.pkl"
-    }
-    model_path = model_files.get(ticker)
-    if not model_path or not os.path.exists(model_path):
-        return {"error": f"No model available for ticker {ticker}"}
-    model = pickle.load(open(model_path, "rb"))
+        tuple: (dates, None) with a datetime64[D] array on success, or (None, error message).
+    """
+    if end_date is None and horizon is None:
+        return None, "Provide end_date or horizon."
     try:
-        target_date = datetime.strptime(forecast_date, "%Y-%m-%d")
+        start = datetime.strptime(start_date, "%Y-%m-%d") if start_date else datetime.today()
+        end = datetime.strptime(end_date, "%Y-%m-%d") if end_date is not None else None
     except ValueError:
-        return {"error": "Invalid date format. Use YYYY-MM-DD."}
-
-    last_train_date = model.history['ds'].max()
-    days_ahead = (target_date - last_train_date).days
-    if days_ahead < 0:
-        return {"error": f"Date must be after the last date in the training data: {last_train_date.strftime('%Y-%m-%d')}"}
-
-    future = model.make_future_dataframe(periods=days_ahead)
-    forecast = model.predict(future)
-    forecast_row = forecast[forecast['ds'] == target_date]
-    if forecast_row.empty:
-        return {"error": "Forecast for the requested date is not available."}
-    predicted_value = float(forecast_row.iloc[0]["yhat"])
-    return {
-        "ticker": ticker,
-        "date": target_date.strftime('%Y-%m-%d'),
-        "predicted_value": predicted_value
-    }
+        return None, "Invalid date format. Use YYYY-MM-DD; ranges are daily."
+    if end is not None:
+        n_days = (end.date() - start.date()).days + 1
+        if n_days < 1:
+            return None, "end_date must not be before start_date."
+    else:
+        n_days = horizon
+    if n_days > FORECAST_RANGE_MAX_DAYS:
+        return None, f"Range is limited to {FORECAST_RANGE_MAX_DAYS} days."
+    return np.datetime64(start.date(), "D") + np.arange(n_days), None
+
+
+def check_range(ticker, first_date, last_date, n_samples=None):
+    """
+    Check one ticker can forecast a range and draw its intervals out to the last date.
+
+    Runs on the prediction pool, so the draws are made in the process that
+    will predict the blocks.
+
+    Returns:
+        str: Error message, or None if the range can be streamed.
+    """
+    entry = registry.get(ticker)
+    if entry is None:
+        return f"No model available for ticker {ticker}"
+    _, error = parse_forecast_date(entry, first_date)
+    if error:
+        return f"{ticker}: {error}"
+    try:
+        predict_dates(entry.model, [last_date], uncertainty=True, draws=entry.draws, n_samples=n_samples)
+    except ValueError as e:
+        return f"{ticker}: {e}"
+    registry.charge(entry, "draws", entry.draws.nbytes)
+    return None
+
+
+def forecast_range_block(ticker, dates, output_format, n_samples=None):
+    """
+    Predict one block of a range for one ticker and encode its rows. Runs on the prediction pool.
+
+    Args:
+        ticker (str): Stock ticker symbol.
+        dates (ndarray): Daily datetime64 dates of the block.
+        output_format (str): "ndjson" or "csv".
+        n_samples (int): Samples for the uncertainty interval.
+
+    Returns:
+        str: Encoded rows for the block.
+    """
+    entry = registry.get(ticker)
+    if entry is None:
+        raise LookupError(f"No model available for ticker {ticker}")
+    block = predict_dates(entry.model, dates, uncertainty=True, draws=entry.draws, n_samples=n_samples)
+    registry.charge(entry, "draws", entry.draws.nbytes)
+    rows = zip(
+        np.datetime_as_string(block["ds"], unit="D").tolist(),
+        block["yhat"].tolist(),
+        block["yhat_lower"].tolist(),
+        block["yhat_upper"].tolist()
+    )
+    if output_format == "csv":
+        return "".join(f"{ticker},{ds},{yhat},{lower},{upper}\n" for ds, yhat, lower, upper in rows)
+    return "".join(
+        json.dumps(dict(zip(RANGE_COLUMNS, (ticker, ds, yhat, lower, upper)))) + "\n"
+        for ds, yhat, lower, upper in rows
+    )
+
+
+async def stream_range(tickers, dates, output_format, block_size=FORECAST_RANGE_BLOCK, n_samples=None):
+    """
+    Yield forecast rows for each ticker over the dates, one chunk per block.
+
+    Each block is a job on the prediction pool. The request was admitted when
+    its range was checked, so blocks wait for a free slot rather than fail
+    halfway through the stream.
+
+    Args:
+        tickers (list): Stock ticker symbols, already checked with check_range.
+        dates (ndarray): Daily datetime64 dates.
+        output_format (str): "ndjson" or "csv".
+        block_size (int): Dates predicted per chunk.
+        n_samples (int): Samples for the uncertainty interval.
+
+    Yields:
+        str: Encoded rows for one block.
+    """
+    if output_format == "csv":
+        yield ",".join(RANGE_COLUMNS) + "\n"
+    for ticker in tickers:
+        for start in range(0, len(dates), block_size):
+            call = (ticker, dates[start:start + block_size], output_format, n_samples)
+            [chunk] = await prediction_pool.run(forecast_range_block, [call], admitted=True)
+            yield chunk
+
+
+@app.get("/forecast/range")
+@instrumented("forecast_range")
+async def predict_stock_range(
+    ticker: list[str] = Query(..., description="Stock ticker symbol; repeat for several tickers"),
+    start_date: str = Query(None, description="First date in YYYY-MM-DD format. Defaults to today"),
+    end_date: str = Query(None, description="Last date in YYYY-MM-DD format"),
+    horizon: int = Query(None, ge=1, description="Number of days from start_date, if end_date is not given"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson or csv"),
+    samples: int = Query(None, ge=1, le=FORECAST_MAX_SAMPLES, description="Samples for the uncertainty interval")
+):
+    """
+    Stream a daily forecast path with uncertainty intervals for one or more tickers.
+
+    Rows (ticker, ds, yhat, yhat_lower, yhat_upper) are predicted on the
+    prediction pool and sent in blocks of FORECAST_RANGE_BLOCK days, so long
+    ranges never build one large frame in memory.
+
+    Args:
+        ticker (list): Stock ticker symbols.
+        start_date (str): First date to forecast.
+        end_date (str): Last date to forecast.
+        horizon (int): Days to forecast when end_date is omitted.
+        format (str): Output format, ndjson or csv.
+        samples (int): Samples for the uncertainty interval.
+
+    Returns:
+        StreamingResponse: The rows, an error dict if the request is invalid, or a 503 when the prediction
+        pool is full.
+    """
+    dates, error = parse_range_dates(start_date, end_date, horizon)
+    if error:
+        return {"error": error}
+    tickers = list(dict.fromkeys(ticker))
+    first_date, last_date = str(dates[0]), str(dates[-1])
+    try:
+        errors = await prediction_pool.run(check_range, [(name, first_date, last_date, samples) for name in tickers])
+    except PoolSaturated:
+        return saturated_response()
+    for error in errors:
+        if error:
+            return {"error": error}
+    return StreamingResponse(
+        stream_range(tickers, dates, format, n_samples=samples), media_type=RANGE_MEDIA_TYPES[format]
+    )
+
+
+@app.get("/ready")
+def readiness():
+    """
+    Readiness probe: 200 once workers are up and the optional warm-up has finished, 503 before.
+    """
+    if not startup.ready:
+        return JSONResponse(status_code=503, content={"ready": False})
+    return {"ready": True}
+
+
+@app.get("/startup")
+def startup_report():
+    """
+    Report import, worker start and warm-up times for this server process.
+    """
+    return {"ready": startup.ready, **startup.report}
+
+
+@app.get("/tickers")
+def list_tickers():
+    """
+    List every ticker that has a prod model and can be forecast.
+
+    Returns:
+        dict: Sorted ticker symbols under "tickers".
+    """
+    return {"tickers": registry.tickers()}
+
+
+@app.get("/models")
+def list_models():
+    """
+    List the prod models currently loaded in memory.
 
+    Returns:
+        dict: Model version per ticker.
+    """
+    return registry.versions()
+
+
+@app.get("/metrics")
+def metrics():
+    """
+    Expose stage timings, cache counters, model loads and in-flight requests for Prometheus.
+
+    With PREDICT_WORKERS > 0 this includes the metrics recorded in the worker processes.
+    """
+    content, content_type = metrics_payload()
+    return Response(content=content, media_type=content_type)
+
+
+@app.post("/debug/profile")
+def start_profile(requests: int = Query(10, ge=1, description="Number of requests to profile")):
+    """
+    Profile the next N forecast requests with cProfile.
+
+    Only available when the server runs with FORECASTER_PROFILING=1 and
+    predicts in-process (PREDICT_WORKERS=0): forecast jobs in worker processes
+    are out of the profiler's reach.
+
+    Args:
+        requests (int): Number of requests to capture.
+
+    Returns:
+        dict: Path the .prof file will be written to.
+    """
+    if not PROFILING_ENABLED:
+        return {"error": "Profiling is disabled. Set FORECASTER_PROFILING=1 to enable it."}
+    if prediction_pool.workers > 0:
+        return {"error": "Profiling only covers in-process predictions. Restart with PREDICT_WORKERS=0 to profile."}
+    return {"requests": requests, "path": profiler.arm(requests)}
+
+
+@app.get("/debug/profile")
+def profile_status():
+    """
+    Report how many requests the armed profile still needs and where it was written.
+    """
+    return profiler.status()
@@ -0,0 +1,163 @@
+import io
+import json
+import os
+import pickle
+import sys
+import numpy as np
+from prediction import last_train_date, supports_fast_path
+
+ARTIFACT_SUFFIX = ".npz"
+
+
+class CompactModel:
+    """
+    The fitted state of a Prophet model without the Prophet object or its history.
+
+    Holds only what prediction.predict_dates needs: the MAP parameters, the
+    changepoints, the time and value scaling, and the seasonality config. The
+    attribute names mirror Prophet's, so the same predict code serves both.
+    """
+
+    def __init__(self, params, changepoints_t, config):
+        self.params = params
+        self.changepoints_t = changepoints_t
+        self.growth = config["growth"]
+        self.start = np.datetime64(config["start"], "ns")
+        self.t_scale = np.timedelta64(config["t_scale_ns"], "ns")
+        self.last_ds = np.datetime64(config["last_ds"], "ns")
+        self.y_scale = config["y_scale"]
+        self.y_min = config["y_min"]
+        self.scaling = config["scaling"]
+        self.seasonalities = dict(config["seasonalities"])
+        self.interval_width = config["interval_width"]
+        self.uncertainty_samples = config["uncertainty_samples"]
+        self.holidays = None
+        self.extra_regressors = {}
+        self.mcmc_samples = 0
+        self.data_hash = config.get("data_hash")
+        self.config = config
+
+
+def artifact_path(model_path):
+    """
+    Return the compact artifact path that sits next to a pickle path.
+
+    Parameters:
+        model_path (str): Path to a .pkl model file.
+
+    Returns:
+        str: The same path with a .npz suffix.
+    """
+    return os.path.splitext(model_path)[0] + ARTIFACT_SUFFIX
+
+
+def export_model(model, path):
+    """
+    Write the fitted parameters of a Prophet model to a compact .npz artifact.
+
+    The file is written to a temporary path and renamed over the target, so
+    readers never see a partial artifact.
+
+    Parameters:
+        model (Prophet): Trained Prophet model.
+        path (str): Destination .npz path.
+    """
+    if not supports_fast_path(model):
+        raise ValueError("Model uses features the compact format cannot represent")
+    config = {
+        "growth": model.growth,
+        "start": str(np.datetime64(model.start, "ns")),
+        "t_scale_ns": int(np.timedelta64(model.t_scale, "ns").astype(np.int64)),
+        "last_ds": str(np.datetime64(last_train_date(model), "ns")),
+        "y_scale": float(model.y_scale),
+        "y_min": float(getattr(model, "y_min", 0.0)),
+        "scaling": getattr(model, "scaling", "absmax"),
+        "seasonalities": [[name, props] for name, props in model.seasonalities.items()],
+        "interval_width": float(model.interval_width),
+        "uncertainty_samples": int(model.uncertainty_samples),
+        "data_hash": getattr(model, "data_hash", None)
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(
+            f,
+            k=np.nanmean(model.params["k"], axis=0).ravel(),
+            m=np.nanmean(model.params["m"], axis=0).ravel(),
+            delta=np.nanmean(np.atleast_2d(model.params["delta"]), axis=0),
+            beta=np.nanmean(np.atleast_2d(model.params["beta"]), axis=0),
+            sigma_obs=np.nanmean(model.params["sigma_obs"], axis=0).ravel(),
+            changepoints_t=np.asarray(model.changepoints_t, dtype=float),
+            config=np.array(json.dumps(config))
+        )
+    os.replace(tmp_path, path)
+
+
+def load_artifact(source):
+    """
+    Load a compact model from a .npz path or file-like object.
+
+    Parameters:
+        source (str or file): Artifact to read.
+
+    Returns:
+        CompactModel: Model that prediction.predict_dates can evaluate.
+    """
+    with np.load(source, allow_pickle=False) as data:
+        params = {name: data[name] for name in ("k", "m", "delta", "beta", "sigma_obs")}
+        return CompactModel(params, data["changepoints_t"], json.loads(str(data["config"])))
+
+
+def resolve_model_path(model_path):
+    """
+    Prefer the compact artifact next to a pickle path when one exists.
+
+    Parameters:
+        model_path (str): Path to a .pkl model file.
+
+    Returns:
+        str: Path of the file to load.
+    """
+    compact_path = artifact_path(model_path)
+    if os.path.exists(compact_path):
+        return compact_path
+    return model_path
+
+
+def model_from_bytes(payload, path):
+    """
+    Deserialize a model read from `path`, choosing the format by suffix.
+
+    Parameters:
+        payload (bytes): Raw file contents.
+        path (str): Path the bytes were read from.
+
+    Returns:
+        CompactModel or Prophet: The loaded model.
+    """
+    if path.endswith(ARTIFACT_SUFFIX):
+        return load_artifact(io.BytesIO(payload))
+    return pickle.loads(payload)
+
+
+def load_model(model_path):
+    """
+    Load a model for prediction, using the compact artifact when available.
+
+    Parameters:
+        model_path (str): Path to a .pkl model file.
+
+    Returns:
+        CompactModel or Prophet: The loaded model.
+    """
+    path = resolve_model_path(model_path)
+    with open(path, "rb") as f:
+        return model_from_bytes(f.read(), path)
+
+
+if __name__ == "__main__":
+    # Convert existing pickles, e.g. `python artifact.py models/*.pkl`
+    for pickle_path in sys.argv[1:]:
+        with open(pickle_path, "rb") as f:
+            model = pickle.load(f)
+        export_model(model, artifact_path(pickle_path))
+        print(f"Exported {pickle_path} to {artifact_path(pickle_path)}")
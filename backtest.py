@@ -0,0 +1,131 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from prediction import predict_dates
+
+HORIZONS = (1, 5, 10)
+
+
+def rolling_cutoffs(n_rows, n_cutoffs=26, step=5, min_train=60):
+    """
+    Return evenly spaced forecast origins ending one row before the end of the history.
+
+    The defaults are weekly origins (5 trading days apart) over about the last
+    six months. Origins that would leave fewer than `min_train` training rows
+    are dropped.
+
+    Parameters:
+        n_rows (int): Number of rows in the history.
+        n_cutoffs (int): Number of origins.
+        step (int): Rows between consecutive origins.
+        min_train (int): Fewest rows a model is trained on.
+
+    Returns:
+        ndarray: Row positions of the origins, oldest first.
+    """
+    cutoffs = n_rows - 2 - step * np.arange(n_cutoffs)[::-1]
+    return cutoffs[cutoffs >= min_train - 1]
+
+
+def _target_rows(n_rows, cutoffs, horizons):
+    # Horizons count rows (trading days) after each cutoff
+    rows = np.asarray(cutoffs, dtype=int)[:, None] + np.asarray(horizons, dtype=int)[None, :]
+    valid = rows < n_rows
+    return np.minimum(rows, n_rows - 1), valid
+
+
+def _metrics(name, yhat, y, valid, horizons):
+    err = np.where(valid, yhat - y, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ape = np.where(valid & (y != 0), np.abs(err) / np.abs(y), np.nan)
+    n = valid.sum(axis=0)
+    has_rows = n > 0
+    mae = np.full(len(horizons), np.nan)
+    rmse = np.full(len(horizons), np.nan)
+    mape = np.full(len(horizons), np.nan)
+    mae[has_rows] = np.nanmean(np.abs(err[:, has_rows]), axis=0)
+    rmse[has_rows] = np.sqrt(np.nanmean(err[:, has_rows] ** 2, axis=0))
+    mape[has_rows] = np.nanmean(ape[:, has_rows], axis=0) * 100
+    return pd.DataFrame({
+        "model": name,
+        "horizon": list(horizons),
+        "n": n,
+        "mae": mae,
+        "rmse": rmse,
+        "mape": mape
+    })
+
+
+def score_models(models, df, cutoffs, horizons=HORIZONS):
+    """
+    Score already fitted models over many cutoffs and horizons at once.
+
+    Every (cutoff, horizon) pair maps to a target row. Each model predicts the
+    distinct target dates in one vectorized call, and errors are aligned by
+    row position, so the cost does not grow with the number of cutoffs. The
+    models are not refit, so the horizon only picks which rows are scored;
+    use rolling_origin for the error at a given number of steps ahead.
+
+    Parameters:
+        models (dict): Fitted models (Prophet or CompactModel) keyed by name; None entries are skipped.
+        df (DataFrame): History with ds and y columns, sorted by ds.
+        cutoffs (array-like): Row positions of the forecast origins.
+        horizons (tuple): Steps ahead, in rows, to score.
+
+    Returns:
+        DataFrame: One row per (model, horizon) with n, mae, rmse and mape.
+    """
+    ds = df["ds"].to_numpy(dtype="datetime64[ns]")
+    y = df["y"].to_numpy(dtype=float)
+    rows, valid = _target_rows(len(df), cutoffs, horizons)
+    needed = np.unique(rows[valid])
+    frames = []
+    for name, model in models.items():
+        if model is None:
+            continue
+        yhat = np.full(len(df), np.nan)
+        if len(needed):
+            yhat[needed] = predict_dates(model, ds[needed])["yhat"]
+        frames.append(_metrics(name, yhat[rows], y[rows], valid, horizons))
+    if not frames:
+        return pd.DataFrame(columns=["model", "horizon", "n", "mae", "rmse", "mape"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def _fit_and_predict(fit_fn, train_df, dates):
+    return predict_dates(fit_fn(train_df), dates)["yhat"]
+
+
+def rolling_origin(fit_fn, df, cutoffs, horizons=HORIZONS, max_workers=None, name="rolling_origin"):
+    """
+    Refit a model at each cutoff and score its out-of-sample forecasts.
+
+    Fits run in parallel on a process pool, one per cutoff. fit_fn must be
+    picklable (a module-level function such as forecast.train_model).
+
+    Parameters:
+        fit_fn (callable): Takes a training DataFrame and returns a fitted model.
+        df (DataFrame): History with ds and y columns, sorted by ds.
+        cutoffs (array-like): Row positions of the forecast origins.
+        horizons (tuple): Steps ahead, in rows, to score.
+        max_workers (int): Worker processes. Defaults to os.cpu_count().
+        name (str): Value for the model column of the result.
+
+    Returns:
+        DataFrame: One row per horizon with n, mae, rmse and mape.
+    """
+    ds = df["ds"].to_numpy(dtype="datetime64[ns]")
+    y = df["y"].to_numpy(dtype=float)
+    cutoffs = np.asarray(cutoffs, dtype=int)
+    rows, valid = _target_rows(len(df), cutoffs, horizons)
+    yhat = np.full(rows.shape, np.nan)
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+        futures = {
+            i: pool.submit(_fit_and_predict, fit_fn, df.iloc[:cutoff + 1], ds[rows[i, valid[i]]])
+            for i, cutoff in enumerate(cutoffs)
+            if valid[i].any()
+        }
+        for i, future in futures.items():
+            yhat[i, valid[i]] = future.result()
+    return _metrics(name, yhat, y[rows], valid, horizons)
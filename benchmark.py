@@ -0,0 +1,292 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from store import PriceStore
+from tickers import DEFAULT_TICKERS, model_path
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def synthetic_tickers(n_tickers):
+    """
+    Return ticker names for a synthetic universe, starting with the real tickers.
+    """
+    extra = [f"SYN{i:03d}" for i in range(max(n_tickers - len(DEFAULT_TICKERS), 0))]
+    return (list(DEFAULT_TICKERS) + extra)[:n_tickers]
+
+
+def synthetic_prices(n_tickers=3, years=1.0, seed=0, end="2025-09-30"):
+    """
+    Generate daily OHLCV bars in the stocks.csv schema.
+
+    Each ticker follows a geometric random walk with its own drift and
+    volatility over business days.
+
+    Parameters:
+        n_tickers (int): Number of tickers.
+        years (float): Length of history per ticker.
+        seed (int): Random seed.
+        end (str): Last date of the series.
+
+    Returns:
+        DataFrame: date, open, high, low, close, volume and ticker columns.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=end, periods=max(int(252 * years), 10))
+    frames = []
+    for ticker in synthetic_tickers(n_tickers):
+        drift = rng.normal(0.0005, 0.0005)
+        vol = rng.uniform(0.01, 0.04)
+        close = rng.uniform(20, 500) * np.exp(np.cumsum(rng.normal(drift, vol, len(dates))))
+        open_ = close * np.exp(rng.normal(0, vol / 2, len(dates)))
+        spread = np.abs(rng.normal(0, vol, len(dates)))
+        frames.append(pd.DataFrame({
+            "date": dates,
+            "open": open_,
+            "high": np.maximum(open_, close) * (1 + spread),
+            "low": np.minimum(open_, close) * (1 - spread),
+            "close": close,
+            "volume": rng.integers(1_000_000, 100_000_000, len(dates)).astype(float),
+            "ticker": ticker
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def traced_memory_mb(fn):
+    """
+    Call fn once under tracemalloc and return the memory it allocated.
+
+    Covers Python objects and NumPy buffers allocated in this process, not
+    memory used by subprocesses or native libraries that bypass Python's
+    allocator.
+
+    Returns:
+        tuple: (peak MB above the starting point during the call, MB still held after it).
+    """
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        fn()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (peak - before) / (1024 * 1024), (after - before) / (1024 * 1024)
+
+
+def measure(fn, repeats):
+    """
+    Call fn `repeats` times and summarise its latency and memory.
+
+    Memory comes from one further call traced with tracemalloc, kept out of
+    the timed calls because tracing slows allocation down.
+
+    Returns:
+        dict: p50/p95/p99/mean in milliseconds, calls per second, and the
+        stage's peak and retained allocations in MB.
+    """
+    timings = []
+    start = time.perf_counter()
+    for _ in range(repeats):
+        call_start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - call_start) * 1000)
+    total = time.perf_counter() - start
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    alloc_peak_mb, alloc_retained_mb = traced_memory_mb(fn)
+    return {
+        "repeats": repeats,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "mean_ms": float(np.mean(timings)),
+        "throughput_per_s": repeats / total if total > 0 else None,
+        "alloc_peak_mb": alloc_peak_mb,
+        "alloc_retained_mb": alloc_retained_mb
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def import_times(module="app.server", top=15):
+    """
+    Return the cumulative import time of the heaviest packages pulled in by a module.
+
+    Runs `python -X importtime` in a fresh interpreter, so nothing is cached.
+
+    Parameters:
+        module (str): Module to import.
+        top (int): Number of packages to report.
+
+    Returns:
+        dict: Milliseconds per top-level package, heaviest first, plus the module itself.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=REPO_DIR,
+                            capture_output=True, text=True, check=True)
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        name = name.strip()
+        if name == module or "." not in name:
+            try:
+                cumulative[name] = max(cumulative.get(name, 0.0), int(cumulative_us) / 1000)
+            except ValueError:
+                continue
+    ranked = sorted(cumulative.items(), key=lambda item: item[1], reverse=True)
+    return dict(ranked[:top])
+
+
+def run_benchmarks(n_tickers=3, years=1.0, repeats=20, fit_repeats=3, seed=0):
+    """
+    Time the data, training, forecasting and serving hot paths on synthetic data.
+
+    Everything runs offline inside a temporary working directory holding the
+    synthetic price store and freshly trained prod models.
+
+    Returns:
+        dict: Results keyed by stage name.
+    """
+    from fastapi.testclient import TestClient
+    from forecast import load_and_split_data, train_model, forecast_with_model, save_model
+    import retraining
+    from prediction import TrendDraws, predict_dates
+    from app import server
+
+    results = {}
+    server_import = [sys.executable, "-c", "import app.server"]
+    results["server_cold_import"] = measure(
+        lambda: subprocess.run(server_import, cwd=REPO_DIR, check=True, capture_output=True), min(repeats, 5)
+    )
+    prices = synthetic_prices(n_tickers, years, seed)
+    tickers = synthetic_tickers(n_tickers)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            os.makedirs("models")
+            store_path = os.path.join(workdir, "data", "prices")
+            PriceStore(store_path).upsert(prices)
+            ticker = tickers[0]
+
+            results["load_and_split_data"] = measure(lambda: load_and_split_data(store_path, ticker), repeats)
+            train_df, _ = load_and_split_data(store_path, ticker)
+            results["train_model"] = measure(lambda: train_model(train_df), fit_repeats)
+
+            for name in tickers:
+                name_train_df, _ = load_and_split_data(store_path, name)
+                save_model(train_model(name_train_df), model_path(name, "models"))
+            model = retraining.load_model(model_path(ticker, "models"))
+            prophet_model = pd.read_pickle(model_path(ticker, "models"))
+            results["forecast_with_model"] = measure(lambda: forecast_with_model(prophet_model, 30), repeats)
+            results["forecast_with_model_sparse"] = measure(
+                lambda: forecast_with_model(prophet_model, 30, sparse=True, uncertainty=False), repeats
+            )
+            # Intervals over the next 30 days: fresh simulation on every call vs the cached per-model draws
+            interval_dates = pd.Timestamp(model.last_ds) + pd.to_timedelta(np.arange(1, 31), "D")
+            results["predict_intervals"] = measure(
+                lambda: predict_dates(model, interval_dates, uncertainty=True), repeats
+            )
+            draws = TrendDraws(model)
+            results["predict_intervals_cached"] = measure(
+                lambda: predict_dates(model, interval_dates, uncertainty=True, draws=draws), repeats
+            )
+            results["evaluate_mae"] = measure(lambda: retraining.evaluate_mae(store_path, ticker, 7), repeats)
+
+            server.registry = server.ModelRegistry("models")
+            server.forecast_cache = server.ForecastCache()
+            server.registry.on_evict.append(server.forecast_cache.discard)
+            server.forecast_cache.on_grow.append(server.registry.charge)
+            client = TestClient(server.app)
+            last_date = pd.Timestamp(model.last_ds)
+            rng = np.random.default_rng(seed)
+
+            def forecast_request():
+                day = int(rng.integers(1, 365))
+                target = (last_date + pd.Timedelta(days=day)).strftime("%Y-%m-%d")
+                response = client.get("/forecast", params={"ticker": ticker, "forecast_date": target})
+                response.raise_for_status()
+
+            results["api_forecast_cold"] = measure(forecast_request, 1)
+            results["api_forecast"] = measure(forecast_request, repeats)
+            horizons = [1, 5, 10, 30]
+            results["api_forecast_batch"] = measure(
+                lambda: client.post("/forecast/batch", json={"tickers": tickers, "horizons": horizons}).raise_for_status(),
+                repeats
+            )
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def compare(results, baseline):
+    """
+    Print the p50 ratio of each stage against a previous results file.
+    """
+    for stage, current in results["results"].items():
+        previous = baseline.get("results", {}).get(stage)
+        if previous is None or not previous.get("p50_ms"):
+            continue
+        ratio = current["p50_ms"] / previous["p50_ms"]
+        flag = "  <-- slower" if ratio > 1.1 else ""
+        print(f"{stage:30s} {previous['p50_ms']:10.2f} -> {current['p50_ms']:10.2f} ms ({ratio:.2f}x){flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the forecaster on synthetic market data.")
+    parser.add_argument("--tickers", type=int, default=3, help="Number of synthetic tickers")
+    parser.add_argument("--years", type=float, default=1.0, help="Years of daily history per ticker")
+    parser.add_argument("--repeats", type=int, default=20, help="Timed calls per stage")
+    parser.add_argument("--fit-repeats", type=int, default=3, help="Timed calls for train_model")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "tickers": args.tickers,
+            "years": args.years,
+            "repeats": args.repeats,
+            "fit_repeats": args.fit_repeats,
+            "seed": args.seed
+        },
+        "results": run_benchmarks(args.tickers, args.years, args.repeats, args.fit_repeats, args.seed),
+        "server_import_ms": import_times("app.server"),
+        # Process-wide high-water mark over the whole run; per-stage memory is in each stage's alloc_* fields
+        "peak_rss_mb": peak_rss_mb()
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    for stage, stats in report["results"].items():
+        print(f"{stage:30s} p50={stats['p50_ms']:9.2f}ms p95={stats['p95_ms']:9.2f}ms "
+              f"p99={stats['p99_ms']:9.2f}ms alloc={stats['alloc_peak_mb']:.1f}MB")
+    print("Server import time by package (ms):", report["server_import_ms"])
+    print(f"Peak RSS over the run: {report['peak_rss_mb']:.0f}MB")
+    print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
@@ -1,33 +1,311 @@
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+import httpx
 import requests
-from datetime import datetime, timedelta
-today = datetime.today()
-predictions = []
-predictions_post = []
-predictions_get = []
-# Example: forecast for 1, 5, 10, 30 days ahead from today for each ticker
-tickers = ["NVDA", "MSFT", "PLTR"]
-days_list = [1, 5, 10, 30]
-today = datetime.today()
-data = []
-for ticker in tickers:
-    for days in days_list:
-        forecast_date = (today + timedelta(days=days)).strftime("%Y-%m-%d")
-        data.append((ticker, forecast_date))
-
-url = "http://0.0.0.0:8000/forecast"
-predictions = []
-
-for ticker, forecast_date in data:
-    params = {"ticker": ticker, "forecast_date": forecast_date}
-    response = requests.get(url, params=params)
-    try:
-        predictions.append(response.json())
-    except Exception:
-        predictions.append({"error": f"Non-JSON response: {response.text}"})
-
-print("GET request predictions:")
-for prediction in predictions:
-    if "error" in prediction:
-        print(f"Error for {prediction.get('ticker', 'N/A')}: {prediction['error']}")
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+BASE_URL = os.environ.get("FORECASTER_URL", "http://0.0.0.0:8000")
+# Pool saturation (503 with Retry-After), rate limits and gateway errors are worth retrying
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# The server's default PREDICT_QUEUE_SIZE: a chunk is one job per ticker, so a
+# chunk of this size never holds more than a default server queues at once
+BATCH_TICKERS = 16
+
+
+def format_date(value):
+    """
+    Format a date, datetime or string the way the API expects it.
+
+    Parameters:
+        value (date, datetime or str): Date or timestamp to forecast.
+
+    Returns:
+        str: YYYY-MM-DD for dates, an ISO timestamp for datetimes with a time of day.
+    """
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d") if value.time() == datetime.min.time() else value.isoformat()
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%d")
+    return value
+
+
+def range_dates(start_date=None, end_date=None, horizon=None):
+    """
+    Return the daily dates /forecast/range would cover, for servers without it.
+    """
+    start = datetime.fromisoformat(format_date(start_date)) if start_date else datetime.today()
+    if end_date is not None:
+        n_days = (datetime.fromisoformat(format_date(end_date)) - start).days + 1
+    elif horizon is not None:
+        n_days = horizon
     else:
-        print(f"Ticker: {prediction['ticker']}, Date: {prediction['date']}, Predicted Value: {prediction['predicted_value']}")
\ No newline at end of file
+        raise ValueError("Provide end_date or horizon.")
+    return [(start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(max(n_days, 0))]
+
+
+def single_result(ticker, forecast_date, payload):
+    # /forecast returns a bare {"error": ...}; add the ticker and date like /forecast/batch does
+    if "error" in payload:
+        return {"ticker": ticker, "date": forecast_date, "error": payload["error"]}
+    return payload
+
+
+def range_row(result):
+    # Rows rebuilt from point forecasts have no interval
+    return {"ticker": result["ticker"], "ds": result["date"], "yhat": result.get("predicted_value"),
+            "yhat_lower": None, "yhat_upper": None, **({"error": result["error"]} if "error" in result else {})}
+
+
+class ForecastClient:
+    """
+    Synchronous client for the forecaster API.
+
+    One pooled requests session keeps up to `concurrency` connections alive,
+    and failed requests (connection errors and RETRY_STATUSES) are retried
+    with exponential backoff, honouring Retry-After. Bulk calls use
+    /forecast/batch and /forecast/range when the server's OpenAPI schema
+    lists them, and otherwise send single /forecast calls in parallel.
+
+        with ForecastClient("http://localhost:8000") as client:
+            results = client.forecast_many(["NVDA", "MSFT"], ["2025-12-01", "2025-12-02"])
+    """
+
+    def __init__(self, base_url=BASE_URL, concurrency=8, retries=3, backoff=0.5, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._endpoints = None
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            # The API's POSTs only read, so they are safe to repeat
+            allowed_methods=None,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def _get(self, path, **params):
+        response = self.session.get(f"{self.base_url}{path}", params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def endpoints(self):
+        """
+        Return the API paths the server offers, read once from its OpenAPI schema.
+        """
+        if self._endpoints is None:
+            try:
+                self._endpoints = set(self._get("/openapi.json")["paths"])
+            except (requests.RequestException, ValueError, KeyError):
+                self._endpoints = {"/forecast"}
+        return self._endpoints
+
+    def forecast(self, ticker, forecast_date):
+        """
+        Forecast one ticker on one date.
+
+        Returns:
+            dict: ticker, date, predicted_value and model_version, or ticker, date and error.
+        """
+        forecast_date = format_date(forecast_date)
+        return single_result(ticker, forecast_date, self._get("/forecast", ticker=ticker, forecast_date=forecast_date))
+
+    def forecast_many(self, tickers, forecast_dates):
+        """
+        Forecast every combination of tickers and dates.
+
+        Parameters:
+            tickers (list): Stock ticker symbols.
+            forecast_dates (list): Dates or timestamps.
+
+        Returns:
+            list: One result dict per (ticker, date) pair, ticker by ticker.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        forecast_dates = [format_date(value) for value in forecast_dates]
+        if "/forecast/batch" in self.endpoints():
+            # Chunks go one after another: the server already predicts a
+            # chunk's tickers in parallel, and concurrent chunks would only
+            # fill its queue and be answered with 503s
+            return [
+                result
+                for i in range(0, len(tickers), BATCH_TICKERS)
+                for result in self._post_batch(tickers[i:i + BATCH_TICKERS], forecast_dates)
+            ]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            pairs = [(ticker, forecast_date) for ticker in tickers for forecast_date in forecast_dates]
+            return list(pool.map(lambda pair: self.forecast(*pair), pairs))
+
+    def _post_batch(self, tickers, forecast_dates):
+        response = self.session.post(
+            f"{self.base_url}/forecast/batch",
+            json={"tickers": tickers, "forecast_dates": forecast_dates},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()["results"]
+
+    def forecast_range(self, tickers, start_date=None, end_date=None, horizon=None):
+        """
+        Yield daily forecast rows over a date range, streamed as they arrive.
+
+        With /forecast/range the rows carry yhat_lower and yhat_upper; on
+        servers without it they are rebuilt from point forecasts and the
+        interval is None.
+
+        Parameters:
+            tickers (list): Stock ticker symbols.
+            start_date (date or str): First date; defaults to today.
+            end_date (date or str): Last date.
+            horizon (int): Days to forecast when end_date is omitted.
+
+        Yields:
+            dict: ticker, ds, yhat, yhat_lower and yhat_upper per ticker and day.
+        """
+        if "/forecast/range" not in self.endpoints():
+            for result in self.forecast_many(tickers, range_dates(start_date, end_date, horizon)):
+                yield range_row(result)
+            return
+        params = {"ticker": list(tickers), "start_date": format_date(start_date), "end_date": format_date(end_date),
+                  "horizon": horizon}
+        with self.session.get(f"{self.base_url}/forecast/range", params=params, timeout=self.timeout,
+                              stream=True) as response:
+            response.raise_for_status()
+            # Invalid requests are answered with a JSON error instead of a stream
+            if response.headers.get("content-type", "").startswith("application/json"):
+                raise ValueError(response.json()["error"])
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+
+class AsyncForecastClient:
+    """
+    asyncio client for the forecaster API, with the same methods as ForecastClient.
+
+    An httpx.AsyncClient keeps up to `concurrency` connections alive and a
+    semaphore caps requests in flight; retries follow the same rules as the
+    synchronous client.
+
+        async with AsyncForecastClient("http://localhost:8000") as client:
+            results = await client.forecast_many(["NVDA"], ["2025-12-01"])
+    """
+
+    def __init__(self, base_url=BASE_URL, concurrency=8, retries=3, backoff=0.5, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.retries = retries
+        self.backoff = backoff
+        self._endpoints = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        self.client = httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=timeout)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def _request(self, method, path, **kwargs):
+        async with self._semaphore:
+            for attempt in range(self.retries + 1):
+                delay = self.backoff * 2 ** attempt
+                try:
+                    response = await self.client.request(method, path, **kwargs)
+                except httpx.TransportError:
+                    if attempt == self.retries:
+                        raise
+                    await asyncio.sleep(delay)
+                    continue
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    response.raise_for_status()
+                    return response.json()
+                retry_after = response.headers.get("Retry-After")
+                await asyncio.sleep(float(retry_after) if retry_after and retry_after.isdigit() else delay)
+
+    async def endpoints(self):
+        if self._endpoints is None:
+            try:
+                self._endpoints = set((await self._request("GET", "/openapi.json"))["paths"])
+            except (httpx.HTTPError, ValueError, KeyError):
+                self._endpoints = {"/forecast"}
+        return self._endpoints
+
+    async def forecast(self, ticker, forecast_date):
+        forecast_date = format_date(forecast_date)
+        payload = await self._request("GET", "/forecast", params={"ticker": ticker, "forecast_date": forecast_date})
+        return single_result(ticker, forecast_date, payload)
+
+    async def forecast_many(self, tickers, forecast_dates):
+        tickers = list(dict.fromkeys(tickers))
+        forecast_dates = [format_date(value) for value in forecast_dates]
+        if "/forecast/batch" in await self.endpoints():
+            results = []
+            for i in range(0, len(tickers), BATCH_TICKERS):
+                chunk = tickers[i:i + BATCH_TICKERS]
+                payload = {"tickers": chunk, "forecast_dates": forecast_dates}
+                response = await self._request("POST", "/forecast/batch", json=payload)
+                results.extend(response["results"])
+            return results
+        return list(await asyncio.gather(*(
+            self.forecast(ticker, forecast_date) for ticker in tickers for forecast_date in forecast_dates
+        )))
+
+    async def forecast_range(self, tickers, start_date=None, end_date=None, horizon=None):
+        """
+        Yield daily forecast rows over a date range; see ForecastClient.forecast_range.
+        """
+        if "/forecast/range" not in await self.endpoints():
+            for result in await self.forecast_many(tickers, range_dates(start_date, end_date, horizon)):
+                yield range_row(result)
+            return
+        params = {"ticker": list(tickers), "start_date": format_date(start_date), "end_date": format_date(end_date),
+                  "horizon": horizon}
+        params = {key: value for key, value in params.items() if value is not None}
+        async with self._semaphore, self.client.stream("GET", "/forecast/range", params=params) as response:
+            response.raise_for_status()
+            if response.headers.get("content-type", "").startswith("application/json"):
+                await response.aread()
+                raise ValueError(response.json()["error"])
+            async for line in response.aiter_lines():
+                if line:
+                    yield json.loads(line)
+
+
+if __name__ == "__main__":
+    # Example: forecast for 1, 5, 10, 30 days ahead from today for each ticker
+    today = date.today()
+    tickers = ["NVDA", "MSFT", "PLTR"]
+    days_list = [1, 5, 10, 30]
+    with ForecastClient() as client:
+        try:
+            predictions = client.forecast_many(tickers, [today + timedelta(days=days) for days in days_list])
+        except requests.RequestException as e:
+            predictions = [{"error": f"Request failed: {e}"}]
+
+    print("Batch request predictions:")
+    for prediction in predictions:
+        if "error" in prediction:
+            print(f"Error for {prediction.get('ticker', 'N/A')}: {prediction['error']}")
+        else:
+            print(f"Ticker: {prediction['ticker']}, Date: {prediction['date']}, Predicted Value: {prediction['predicted_value']}")
@@ -1,17 +1,26 @@
 from airflow import DAG
+from airflow.decorators import task, task_group
+from airflow.exceptions import AirflowSkipException
+from airflow.models import Variable
 from airflow.operators.python import PythonOperator
 from datetime import datetime, timedelta
+import json
 import subprocess
 import os
 import sys
-from retraining import evaluate_mae
 
 today = datetime.today().strftime("%Y-%m-%d")
 
 BASE_DIR = os.environ.get("BASE_DIR")
 sys.path.append(BASE_DIR)
+from store import PriceStore
+from tickers import TICKERS_FILE, load_tickers
+
 EXTRACT_SCRIPT = os.path.join(BASE_DIR, 'extract.py')
-DATA_PATH = os.path.join(BASE_DIR, 'stocks.csv')
+DATA_PATH = os.path.join(BASE_DIR, 'data', 'prices')
+# Pool shared by the tasks of every ticker branch, so at most its slots
+# (MAX_ACTIVE_TICKERS, created by airflow_setup.sh) branches run at once
+TICKER_POOL = "stock_forecaster_tickers"
 
 default_args = {
     'owner': 'airflow',
@@ -24,65 +33,69 @@ default_args = {
 def run_extract():
     subprocess.run(['python3', EXTRACT_SCRIPT], check=True, cwd=BASE_DIR)
 
-def retrain_model():
-    # Retrain models for all tickers
-    import retraining
-    for ticker in ["NVDA", "MSFT", "PLTR"]:
-        retraining.train_and_save_model(ticker=ticker)
-
-def evaluate_model():
-    # Evaluate models for all tickers
-    import retraining
-    for ticker in ["NVDA", "MSFT", "PLTR"]:
-        # No longer required due to changes in retraining.py
-        # if ticker == "NVDA":
-        #     model_path = os.path.join(BASE_DIR, "models/prophet_NVDA_prod.pkl")
-        # elif ticker == "MSFT":
-        #     model_path = os.path.join(BASE_DIR, "models/prophet_MSFT_prod.pkl")
-        # elif ticker == "PLTR":
-        #     model_path = os.path.join(BASE_DIR, "models/prophet_PLTR_prod.pkl")
-        retraining.evaluate_mae(file_path=DATA_PATH, ticker=ticker, days=7)
+def partition_fingerprint(ticker):
+    # The store index changes whenever a ticker's partition gains or replaces rows
+    return json.dumps(PriceStore(DATA_PATH).index().get(ticker), sort_keys=True)
+
+def fingerprint_key(ticker):
+    return f"stock_forecaster_partition_{ticker}"
 
 def git_commit_and_push():
     import subprocess
     # Add updated files
-    subprocess.run(['git', 'add', 'stocks.csv'], check=True, cwd=BASE_DIR)
+    subprocess.run(['git', 'add', 'data/'], check=True, cwd=BASE_DIR)
     subprocess.run(['git', 'add', 'models/'], check=True, cwd=BASE_DIR)
     # Commit changes
     subprocess.run(['git', 'commit', '-m', f'Update data and models from Airflow DAG ({today})'], check=False, cwd=BASE_DIR)
     # Push to remote
     subprocess.run(['git', 'push', 'origin', 'main'], check=False, cwd=BASE_DIR)
 
-dag = DAG(
+with DAG(
     'stock_forecaster_retrain_eval',
     default_args=default_args,
     description='Extract new data, retrain Prophet model, and evaluate MAE on new data',
     schedule_interval='0 9 * * *',  # daily at 9am
     catchup=True,
-)
-
-extract_task = PythonOperator(
-    task_id='run_extract',
-    python_callable=run_extract,
-    dag=dag,
-)
-
-retrain_task = PythonOperator(
-    task_id='retrain_model',
-    python_callable=retrain_model,
-    dag=dag,
-)
-
-evaluate_task = PythonOperator(
-    task_id='evaluate_model',
-    python_callable=evaluate_model,
-    dag=dag,
-)
-
-git_task = PythonOperator(
-    task_id='git_commit_and_push',
-    python_callable=git_commit_and_push,
-    dag=dag,
-)
-
-extract_task >> retrain_task >> evaluate_task >> git_task
\ No newline at end of file
+) as dag:
+
+    extract_task = PythonOperator(
+        task_id='run_extract',
+        python_callable=run_extract,
+    )
+
+    @task
+    def list_tickers():
+        return load_tickers(os.path.join(BASE_DIR, TICKERS_FILE))
+
+    @task(pool=TICKER_POOL)
+    def retrain_model(ticker):
+        # Skip the branch when the ticker's partition is unchanged since its last successful run
+        if Variable.get(fingerprint_key(ticker), default_var=None) == partition_fingerprint(ticker):
+            raise AirflowSkipException(f"No new data for {ticker}")
+        import retraining
+        from tracking import tracker
+        retraining.train_and_save_model(file_path=DATA_PATH, ticker=ticker)
+        # The task runner exits with os._exit, which skips the atexit flush
+        tracker.flush()
+
+    @task(pool=TICKER_POOL)
+    def evaluate_model(ticker):
+        import retraining
+        retraining.evaluate_mae(file_path=DATA_PATH, ticker=ticker, days=7)
+        Variable.set(fingerprint_key(ticker), partition_fingerprint(ticker))
+
+    @task_group(group_id='ticker_branch')
+    def ticker_branch(ticker):
+        # Mapped task group: evaluate_model[i] waits only on retrain_model[i]
+        retrain_model(ticker) >> evaluate_model(ticker)
+
+    branches = ticker_branch.expand(ticker=list_tickers())
+
+    git_task = PythonOperator(
+        task_id='git_commit_and_push',
+        python_callable=git_commit_and_push,
+        # Skipped (unchanged) branches must not block the commit
+        trigger_rule='none_failed',
+    )
+
+    extract_task >> branches >> git_task
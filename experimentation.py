@@ -1,70 +1,231 @@
-import pandas as pd
-import pickle
-import mlflow
-from prophet import Prophet
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime
+from forecast import ENGINES, save_model, forecast_dates
+from artifact import export_model
+import fastfit
+from store import DATA_PATH, load_prices
+from instrumentation import timed
+from tickers import load_tickers, model_path
+from tracking import tracker
 
-def run_experiment(file_path="stocks.csv", ticker="NVDA", param_grid=None, model_dir="models"):
+DEFAULT_PARAM_GRID = [
+    # changepoint_prior_scale controls the flexibility of the trend
+    # seasonality_prior_scale controls the flexibility of the seasonality - left static as there is no seasonality
+    {"changepoint_prior_scale": 0.01, "seasonality_prior_scale": 1.0},
+    {"changepoint_prior_scale": 0.05, "seasonality_prior_scale": 1.0},
+    {"changepoint_prior_scale": 0.1, "seasonality_prior_scale": 1.0},
+    {"changepoint_prior_scale": 0.25, "seasonality_prior_scale": 1.0},
+    {"changepoint_prior_scale": 0.5, "seasonality_prior_scale": 1.0},
+    {"changepoint_prior_scale": 0.8, "seasonality_prior_scale": 1.0}
+]
+
+
+def fit_and_score(train_df, params, eval_days=7):
+    """
+    Fit one configuration and score it on the last `eval_days` rows.
+
+    Runs inside a worker process, so it does no MLflow logging itself.
+
+    Parameters:
+        train_df (DataFrame): Training data with ds and y columns.
+        params (dict): Prophet keyword arguments.
+        eval_days (int): Number of trailing rows to score on.
+
+    Returns:
+        tuple: (model, RMSE or None, fit wall time in seconds).
+    """
+    from prophet import Prophet
+
+    with timed("fit") as timer:
+        model = Prophet(
+            changepoint_prior_scale=params["changepoint_prior_scale"],
+            seasonality_prior_scale=params["seasonality_prior_scale"]
+        )
+        model.fit(train_df)
+    return model, score_tail(model, train_df, eval_days), timer.seconds
+
+
+def fastfit_and_score(frames, params, eval_days=7):
+    """
+    Fit one configuration to many tickers in one batched fastfit pass and score each.
+
+    Parameters:
+        frames (dict): Training DataFrames with ds and y columns, keyed by ticker.
+        params (dict): changepoint_prior_scale and seasonality_prior_scale.
+        eval_days (int): Number of trailing rows to score on.
+
+    Returns:
+        dict: (model, RMSE or None, fit seconds) per ticker; fit time is the batch time split evenly.
+    """
+    with timed("fastfit") as timer:
+        models = fastfit.fit_many(
+            frames,
+            changepoint_prior_scale=params["changepoint_prior_scale"],
+            seasonality_prior_scale=params["seasonality_prior_scale"]
+        )
+    fit_seconds = timer.seconds / max(len(frames), 1)
+    return {
+        ticker: (model, score_tail(model, frames[ticker], eval_days), fit_seconds)
+        for ticker, model in models.items()
+    }
+
+
+def score_tail(model, train_df, eval_days=7):
+    """
+    Return the RMSE of a model on the last `eval_days` rows of its training data, or None.
+    """
+    test_df = train_df.tail(eval_days)
+    forecast = forecast_dates(model, test_df["ds"])
+    y_true = test_df["y"].values
+    y_pred = forecast["yhat"].values
+    if len(y_true) == 0 or len(y_true) != len(y_pred):
+        return None
+    return ((y_true - y_pred) ** 2).mean() ** 0.5
+
+
+def halving_fractions(n_configs, eta=3, min_fraction=1 / 3):
+    """
+    Return the share of history each successive-halving rung trains on.
+
+    Parameters:
+        n_configs (int): Number of configurations in the first rung.
+        eta (int): Factor by which configs are cut and data grown per rung.
+        min_fraction (float): Smallest share of history used by the first rung.
+
+    Returns:
+        list: Increasing fractions ending at 1.0.
+    """
+    # Enough rungs to cut the grid down to one config, limited by how small
+    # a share of history the first rung may train on
+    rungs_to_one = math.ceil(math.log(n_configs, eta)) if n_configs > 1 else 1
+    rungs_allowed = math.floor(math.log(1 / min_fraction, eta) + 1e-9) + 1
+    rungs = max(1, min(rungs_to_one, rungs_allowed))
+    return [float(eta) ** (r - rungs + 1) for r in range(rungs)]
+
+
+def run_search(tickers, file_path=DATA_PATH, param_grid=None, model_dir="models", max_workers=None,
+               halving=False, eta=3, min_fraction=1 / 3, engine="prophet"):
+    """
+    Run the hyperparameter grid for several tickers on a process pool.
+
+    Every (ticker, params) fit of a rung is submitted to the pool at once.
+    With halving=True, early rungs fit on only the most recent share of each
+    ticker's history and keep the best 1/eta configs, so bad settings never
+    pay for a full fit. All MLflow logging happens here in the parent, one
+    run per (ticker, params), with the metric logged per rung as its step.
+
+    With engine="fastfit" each config is fit to all of a rung's tickers in
+    one batched NumPy pass in this process, and no pool is started.
+
+    Parameters:
+        tickers (list): Stock ticker symbols.
+        file_path (str): Price store directory or CSV.
+        param_grid (list): Prophet parameter dicts. Defaults to DEFAULT_PARAM_GRID.
+        model_dir (str): Where run artifacts and prod models are written.
+        max_workers (int): Worker processes for Prophet fits. Defaults to os.cpu_count().
+        halving (bool): Enable successive halving.
+        eta (int): Halving factor.
+        min_fraction (float): Share of history used by the first rung.
+        engine (str): "prophet" or "fastfit".
+
+    Returns:
+        dict: Best {"params", "mae", "model"} per ticker.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine}. Use one of {ENGINES}")
     if param_grid is None:
-        param_grid = [
-            # changepoint_prior_scale controls the flexibility of the trend
-            # seasonality_prior_scale controls the flexibility of the seasonality - left static as there is no seasonality
-            {"changepoint_prior_scale": 0.01, "seasonality_prior_scale": 1.0},
-            {"changepoint_prior_scale": 0.05, "seasonality_prior_scale": 1.0},
-            {"changepoint_prior_scale": 0.1, "seasonality_prior_scale": 1.0},
-            {"changepoint_prior_scale": 0.25, "seasonality_prior_scale": 1.0},
-            {"changepoint_prior_scale": 0.5, "seasonality_prior_scale": 1.0},
-            {"changepoint_prior_scale": 0.8, "seasonality_prior_scale": 1.0}
-        ]
-    df = pd.read_csv(file_path)
-    df = df[df["ticker"] == ticker]
-    df = df.rename(columns={"date": "ds", "close": "y"})
-    df["ds"] = pd.to_datetime(df["ds"])
-    df = df.sort_values("ds")
-    train_df = df.copy()
-    mlflow.set_experiment("prophet_hyperparam_experiments")
-    best_mae = None
-    best_model = None
-    best_params = None
-    for i, params in enumerate(param_grid):
-        run_name = f"{ticker}_run_{i}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        with mlflow.start_run(run_name=run_name):
-            model = Prophet(
-                changepoint_prior_scale=params["changepoint_prior_scale"],
-                seasonality_prior_scale=params["seasonality_prior_scale"]
-            )
-            model.fit(train_df)
-            # Save model
-            model_path = f"{model_dir}/prophet_{ticker}_run_{i}.pkl"
-            with open(model_path, "wb") as f:
-                pickle.dump(model, f)
-            mlflow.log_params(params)
-            mlflow.log_param("ticker", ticker)
-            mlflow.log_artifact(model_path)
-            # Evaluate MAE on last 7 days
-            test_df = train_df.tail(7)
-            future = pd.DataFrame({"ds": test_df["ds"]})
-            forecast = model.predict(future)
-            forecast = forecast.set_index("ds")
-            y_true = test_df["y"].values
-            y_pred = forecast.loc[test_df["ds"], "yhat"].values
-            if len(y_true) == len(y_pred):
-                mae = ((y_true - y_pred) ** 2).mean() ** 0.5
-                mlflow.log_metric("mae_last_7_days", mae)
-                print(f"Run {i} for {ticker}: params={params}, MAE={mae}")
-                if best_mae is None or mae < best_mae:
-                    best_mae = mae
-                    best_model = model
-                    best_params = params
+        param_grid = DEFAULT_PARAM_GRID
+    max_workers = max_workers or os.cpu_count()
+    data = {}
+    for ticker in tickers:
+        df = load_prices(file_path, ticker, columns=["close"])
+        data[ticker] = df.rename(columns={"date": "ds", "close": "y"})
+    fractions = halving_fractions(len(param_grid), eta, min_fraction) if halving else [1.0]
+    candidates = {ticker: list(range(len(param_grid))) for ticker in tickers}
+    models = {}
+    history = {}
+    timings = []
+    batches = 0
+    search_start = time.perf_counter()
+    with nullcontext() if engine == "fastfit" else ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for rung, fraction in enumerate(fractions):
+            rung_data = {
+                ticker: data[ticker].tail(max(int(len(data[ticker]) * fraction), 2)) for ticker in candidates
+            }
+            keys = [(ticker, i) for ticker, config_ids in candidates.items() for i in config_ids]
+            if engine == "fastfit":
+                results = {}
+                for i in sorted({i for _, i in keys}):
+                    frames = {ticker: rung_data[ticker] for ticker, config_ids in candidates.items() if i in config_ids}
+                    for ticker, result in fastfit_and_score(frames, param_grid[i]).items():
+                        results[(ticker, i)] = result
+                    batches += 1
             else:
-                print(f"Run {i} for {ticker}: params={params}, MAE=N/A (no valid predictions)")
-    # Save best model as prophet_{ticker}_prod.pkl
-    if best_model is not None:
-        prod_path = f"{model_dir}/prophet_{ticker}_prod.pkl"
-        with open(prod_path, "wb") as f:
-            pickle.dump(best_model, f)
-        print(f"Best model for {ticker} saved to {prod_path} with MAE={best_mae} and params={best_params}")
+                futures = {
+                    (ticker, i): pool.submit(fit_and_score, rung_data[ticker], param_grid[i]) for ticker, i in keys
+                }
+                results = {key: future.result() for key, future in futures.items()}
+            scores = {}
+            for ticker, i in keys:
+                model, mae, fit_seconds = results[(ticker, i)]
+                timings.append(fit_seconds)
+                scores[(ticker, i)] = mae
+                models[(ticker, i)] = model
+                history.setdefault((ticker, i), []).append((rung, mae, fit_seconds))
+                print(f"Rung {rung} run {i} for {ticker}: params={param_grid[i]}, "
+                      f"MAE={mae if mae is not None else 'N/A'}, fit={fit_seconds:.2f}s")
+            if rung < len(fractions) - 1:
+                for ticker, config_ids in candidates.items():
+                    ranked = sorted(
+                        (i for i in config_ids if scores[(ticker, i)] is not None),
+                        key=lambda i: scores[(ticker, i)]
+                    )
+                    candidates[ticker] = ranked[:max(1, math.ceil(len(config_ids) / eta))]
+    wall_seconds = time.perf_counter() - search_start
+    if engine == "fastfit":
+        print(f"{len(timings)} fits in {batches} batched passes took {sum(timings):.2f}s of fit time "
+              f"in {wall_seconds:.2f}s wall time")
+    else:
+        print(f"{len(timings)} fits took {sum(timings):.2f}s of fit time in {wall_seconds:.2f}s wall time "
+              f"({sum(timings) / wall_seconds:.1f}x speedup on {max_workers} workers)")
+
+    best = {}
+    final_rung = len(fractions) - 1
+    for (ticker, i), rungs in history.items():
+        model = models[(ticker, i)]
+        last_rung, mae, _ = rungs[-1]
+        run_name = f"{ticker}_run_{i}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        with tracker.run("prophet_hyperparam_experiments", run_name) as run:
+            # Save the fitted parameters only; the full pickle is kept for prod
+            run_path = f"{model_dir}/prophet_{ticker}_run_{i}.npz"
+            export_model(model, run_path)
+            run.log_params(param_grid[i])
+            run.log_params({"ticker": ticker, "engine": engine, "rungs_reached": last_rung + 1})
+            run.log_artifact(run_path)
+            for rung, rung_mae, fit_seconds in rungs:
+                run.log_metric("fit_seconds", fit_seconds, step=rung)
+                if rung_mae is not None:
+                    run.log_metric("mae_last_7_days", rung_mae, step=rung)
+        # Only configs that survived to full history are eligible for prod
+        if last_rung == final_rung and mae is not None:
+            if ticker not in best or mae < best[ticker]["mae"]:
+                best[ticker] = {"params": param_grid[i], "mae": mae, "model": model}
+    for ticker, result in best.items():
+        prod_path = model_path(ticker, model_dir)
+        save_model(result["model"], prod_path)
+        print(f"Best model for {ticker} saved to {prod_path} with MAE={result['mae']} and params={result['params']}")
+    return best
+
+
+def run_experiment(file_path=DATA_PATH, ticker="NVDA", param_grid=None, model_dir="models", max_workers=None,
+                   halving=False, engine="prophet"):
+    return run_search([ticker], file_path=file_path, param_grid=param_grid, model_dir=model_dir,
+                      max_workers=max_workers, halving=halving, engine=engine)
 
 if __name__ == "__main__":
-    for ticker in ["NVDA", "MSFT", "PLTR"]:
-        run_experiment(ticker=ticker)
+    run_search(load_tickers())
+    tracker.flush()
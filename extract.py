@@ -1,8 +1,19 @@
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 from datetime import date
+from store import DATA_PATH, PriceStore
+from tickers import load_tickers
+
+BASE_URL = "https://api.twelvedata.com/time_series"
+# Twelve Data's free plan allows 8 API credits per minute
+REQUESTS_PER_MINUTE = int(os.environ.get("TWELVE_DATA_REQUESTS_PER_MINUTE", 8))
+MAX_WORKERS = int(os.environ.get("EXTRACT_MAX_WORKERS", 8))
 def read_api_key(key_name='TWELVE_DATA_API_KEY'):
     """
     Reads the API key from the .env file using python-dotenv.
@@ -13,35 +24,131 @@ def read_api_key(key_name='TWELVE_DATA_API_KEY'):
         raise ValueError(f"{key_name} not found in .env")
     return api_key
 
-def get_stock_data(tickers, api_key, interval='1day'):
+class TokenBucket:
+    """
+    Thread-safe token bucket that allows `rate_per_minute` requests per minute.
+
+    Up to `capacity` requests may go out back to back; after that callers
+    block in acquire() until a token has been refilled.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def make_session(pool_size=MAX_WORKERS):
+    """
+    Create a requests session whose connection pool fits `pool_size` concurrent requests.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def fetch_time_series(session, bucket, params, base_url=BASE_URL, retries=3, backoff=1.0):
+    """
+    Fetch one time_series response, retrying rate-limit and server errors with exponential backoff.
+
+    Parameters:
+        session (requests.Session): Pooled session to send the request with
+        bucket (TokenBucket): Rate limiter shared by all workers, or None
+        params (dict): Query parameters for the time_series endpoint
+        base_url (str): Endpoint URL
+        retries (int): Retries after the first attempt
+        backoff (float): Seconds to wait before the first retry; doubles each time
+
+    Returns:
+        dict: Parsed JSON response
+    """
+    for attempt in range(retries + 1):
+        if bucket is not None:
+            bucket.acquire()
+        delay = backoff * 2 ** attempt
+        try:
+            response = session.get(base_url, params=params, timeout=30)
+        except requests.RequestException:
+            if attempt == retries:
+                raise
+            time.sleep(delay)
+            continue
+        retryable = response.status_code == 429 or response.status_code >= 500
+        if not retryable:
+            data = response.json()
+            # Twelve Data reports quota errors in the body with HTTP 200
+            retryable = data.get("code") == 429
+            if not retryable or attempt == retries:
+                return data
+        elif attempt == retries:
+            response.raise_for_status()
+        retry_after = response.headers.get("Retry-After")
+        time.sleep(float(retry_after) if retry_after and retry_after.isdigit() else delay)
+
+
+def parse_time_series(ticker, data):
+    """
+    Convert a time_series response into a DataFrame in the price store schema.
+    """
+    df = pd.DataFrame(data['values'])
+    df['ticker'] = ticker
+    df['date'] = pd.to_datetime(df['datetime'])
+    # Convert columns to float
+    for col in ['open', 'high', 'low', 'close', 'volume']:
+        df[col] = df[col].astype(float)
+    # Keep only the required columns in the correct order
+    return df[['date', 'open', 'high', 'low', 'close', 'volume', 'ticker']]
+
+
+def get_stock_data(tickers, api_key, interval='1day', store_path=DATA_PATH, base_url=BASE_URL,
+                   max_workers=MAX_WORKERS, requests_per_minute=REQUESTS_PER_MINUTE, retries=3, backoff=1.0):
     """
     Fetch only missing daily stock data from Twelve Data API and return as a dict of DataFrames.
 
+    Tickers are fetched concurrently over a pooled session, throttled by a
+    shared token bucket. A failure for one ticker is reported and leaves that
+    ticker as None without affecting the others.
+
     Parameters:
         tickers (list): List of stock symbols (e.g., ['NVDA', 'PLTR'])
         api_key (str): Your Twelve Data API key
         interval (str): Data interval (e.g., '1day')
+        store_path (str): Price store whose index gives each ticker's last date
+        base_url (str): time_series endpoint, e.g. a local stub server in tests
+        max_workers (int): Number of concurrent requests
+        requests_per_minute (int): Request quota; None disables throttling
+        retries (int): Retries per ticker for rate-limit and server errors
+        backoff (float): Initial retry delay in seconds
 
     Returns:
         dict: Dictionary of DataFrames keyed by ticker symbol
     """
-    base_url = "https://api.twelvedata.com/time_series"
     result = {}
+    jobs = {}
     today = pd.Timestamp.today().normalize()
-    # Load existing CSV if it exists
-    try:
-        existing_df = pd.read_csv("stocks.csv", parse_dates=["date"])
-    except FileNotFoundError:
-        existing_df = pd.DataFrame()
+    store = PriceStore(store_path)
 
     for ticker in tickers:
-        # Find last date for this ticker in CSV
-        if not existing_df.empty and ticker in existing_df["ticker"].values:
-            ticker_df = existing_df[existing_df["ticker"] == ticker]
-            last_date = ticker_df["date"].max()
-            last_date = pd.to_datetime(last_date).normalize()
-        else:
-            last_date = None
+        # Last stored date comes from the store's index, not a full data scan
+        last_date = store.last_date(ticker)
+        if last_date is not None:
+            last_date = last_date.normalize()
 
         # If up to date, skip
         if last_date is not None and last_date >= today:
@@ -61,28 +168,34 @@ def get_stock_data(tickers, api_key, interval='1day'):
             result[ticker] = None
             continue
 
-        params = {
+        jobs[ticker] = {
             'symbol': ticker,
             'interval': interval,
             'start_date': start_date.strftime('%Y-%m-%d'),
             'end_date': today.strftime('%Y-%m-%d'),
             'apikey': api_key
         }
-        response = requests.get(base_url, params=params)
-        data = response.json()
-        if "values" in data:
-            df = pd.DataFrame(data['values'])
-            df['ticker'] = ticker
-            df['date'] = pd.to_datetime(df['datetime'])
-            # Convert columns to float
-            for col in ['open', 'high', 'low', 'close', 'volume']:
-                df[col] = df[col].astype(float)
-            # Keep only the required columns in the correct order
-            df = df[['date', 'open', 'high', 'low', 'close', 'volume', 'ticker']]
-            result[ticker] = df
-        else:
-            print(f"Error fetching data for {ticker}: {data.get('message', 'Unknown error')}")
-            result[ticker] = None
+
+    if not jobs:
+        return result
+    bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+    workers = min(max_workers, len(jobs))
+    with make_session(workers) as session, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            ticker: pool.submit(fetch_time_series, session, bucket, params, base_url, retries, backoff)
+            for ticker, params in jobs.items()
+        }
+        for ticker, future in futures.items():
+            try:
+                data = future.result()
+                if "values" in data:
+                    result[ticker] = parse_time_series(ticker, data)
+                else:
+                    print(f"Error fetching data for {ticker}: {data.get('message', 'Unknown error')}")
+                    result[ticker] = None
+            except Exception as e:
+                print(f"Error fetching data for {ticker}: {e}")
+                result[ticker] = None
 
     return result
 
@@ -101,15 +214,30 @@ def save_to_csv(data_dict, filename="stocks.csv"):
     combined_df.to_csv(filename, mode='a', header=write_header, index=False)
     print(f"Data appended to {filename}")
 
+def save_to_store(data_dict, store_path=DATA_PATH):
+    """
+    Upsert all stock data into the price store, replacing rows for dates already stored.
+
+    Parameters:
+        data_dict (dict): Dictionary of DataFrames keyed by ticker symbol
+        store_path (str): Root directory of the price store
+    """
+    frames = [df for df in data_dict.values() if df is not None]
+    if not frames:
+        print("No new data to save")
+        return
+    rows = PriceStore(store_path).upsert(pd.concat(frames, ignore_index=True))
+    print(f"Data upserted into {store_path}: {rows}")
+
 if __name__ == "__main__":
     try:
         api_key = read_api_key()
-        tickers = ['NVDA', 'PLTR', 'MSFT']
+        tickers = load_tickers()
         stock_data = get_stock_data(tickers, api_key)
-        save_to_csv(stock_data)
+        save_to_store(stock_data)
         for ticker, df in stock_data.items():
             if df is not None:
-                print(f"Data for {ticker} appended to CSV.\n{df.head()}\n")
+                print(f"Data for {ticker} saved to the price store.\n{df.head()}\n")
             else:
                 print(f"No data available for {ticker}.\n")
     except Exception as e:
@@ -0,0 +1,210 @@
+import json
+import numpy as np
+from artifact import CompactModel
+from prediction import NS_PER_DAY, to_datetime64
+
+# Prophet's automatic seasonalities: (name, period in days, Fourier order)
+SEASONALITIES = [("yearly", 365.25, 10), ("weekly", 7.0, 3), ("daily", 1.0, 4)]
+
+
+def _changepoints(ds, n_changepoints, changepoint_range):
+    # Same placement as Prophet: evenly spaced rows in the first
+    # changepoint_range of the history, excluding the first row
+    hist_size = int(np.floor(len(ds) * changepoint_range))
+    n_changepoints = min(n_changepoints, hist_size - 1)
+    if n_changepoints <= 0:
+        return ds[:0]
+    indexes = np.linspace(0, hist_size - 1, n_changepoints + 1).round().astype(int)
+    return ds[indexes[1:]]
+
+
+def _active_seasonalities(ds):
+    # Prophet's "auto" rules: yearly needs two years of history, weekly two
+    # weeks sampled more often than weekly, daily two days of intraday bars
+    span_days = (ds[-1] - ds[0]).astype(np.int64) / NS_PER_DAY
+    min_spacing_days = np.diff(ds).astype(np.int64).min() / NS_PER_DAY if len(ds) > 1 else np.inf
+    return {
+        "yearly": span_days >= 730,
+        "weekly": span_days >= 14 and min_spacing_days < 7,
+        "daily": span_days >= 2 and min_spacing_days < 1
+    }
+
+
+def _prepare(df, n_changepoints, changepoint_range):
+    df = df.dropna(subset=["y"]).sort_values("ds")
+    ds = to_datetime64(df["ds"])
+    y = df["y"].to_numpy(dtype=float)
+    if len(ds) < 2:
+        raise ValueError("Need at least two observations to fit")
+    start = ds[0]
+    t_scale = (ds[-1] - start).astype(np.int64)
+    y_scale = float(np.abs(y).max()) or 1.0
+    changepoints = _changepoints(ds, n_changepoints, changepoint_range)
+    return {
+        "ds": ds,
+        "t": (ds - start).astype(np.int64) / t_scale,
+        "y": y / y_scale,
+        "start": start,
+        "t_scale": t_scale,
+        "y_scale": y_scale,
+        "changepoints_t": (changepoints - start).astype(np.int64) / t_scale,
+        "seasonalities": _active_seasonalities(ds)
+    }
+
+
+def _fit_batch(series, changepoint_prior_scale, seasonality_prior_scale, n_iter):
+    """Solve one padded batch of series with batched normal equations."""
+    n_series = len(series)
+    length = max(len(s["t"]) for s in series)
+    n_cp = max(len(s["changepoints_t"]) for s in series)
+    n_fourier = 2 * sum(order for _, _, order in SEASONALITIES)
+    n_params = 2 + n_cp + n_fourier
+
+    mask = np.zeros((n_series, length))
+    t = np.zeros((n_series, length))
+    days = np.zeros((n_series, length))
+    y = np.zeros((n_series, length))
+    # Padded changepoints sit after the end of the history, so their ramps stay 0
+    cps = np.full((n_series, n_cp), 2.0)
+    column_used = np.zeros((n_series, n_params), dtype=bool)
+    column_used[:, :2] = True
+    for i, s in enumerate(series):
+        n = len(s["t"])
+        mask[i, :n] = 1.0
+        t[i, :n] = s["t"]
+        days[i, :n] = s["ds"].astype(np.int64) / NS_PER_DAY
+        y[i, :n] = s["y"]
+        cps[i, :len(s["changepoints_t"])] = s["changepoints_t"]
+        column_used[i, 2:2 + len(s["changepoints_t"])] = True
+
+    n_obs = mask.sum(axis=1)
+    blocks = [t[:, :, None], np.ones((n_series, length, 1)), np.maximum(t[:, :, None] - cps[:, None, :], 0.0)]
+    fourier_means = []
+    col = 2 + n_cp
+    for name, period, order in SEASONALITIES:
+        x = 2 * np.pi * days[:, :, None] * np.arange(1, order + 1)[None, None, :] / period
+        block = np.empty((n_series, length, 2 * order))
+        block[:, :, 0::2] = np.sin(x)
+        block[:, :, 1::2] = np.cos(x)
+        active = np.array([s["seasonalities"][name] for s in series])
+        block *= active[:, None, None]
+        # Centre each Fourier column on the observed rows. Daily stock data
+        # only covers weekdays, where the weekly terms can also express a
+        # constant; centring leaves the level to m instead of the seasonality
+        means = (block * mask[:, :, None]).sum(axis=1) / n_obs[:, None]
+        fourier_means.append(means)
+        blocks.append(block - means[:, None, :])
+        column_used[:, col:col + 2 * order] = active[:, None]
+        col += 2 * order
+    X = np.concatenate(blocks, axis=2) * mask[:, :, None]
+    XtX = np.einsum("blp,blq->bpq", X, X)
+    Xty = np.einsum("blp,bl->bp", X, y)
+
+    # MAP under Prophet's priors for a fixed sigma: k, m ~ N(0, 5),
+    # beta ~ N(0, seasonality_prior_scale) and delta ~ Laplace(0, tau). The
+    # Laplace prior is handled by iteratively reweighted ridge, which
+    # converges to the L1 solution, re-estimating sigma from the residuals
+    sigma2 = np.full(n_series, 0.05 ** 2)
+    delta_weight = np.full((n_series, n_cp), 1.0 / (2 * changepoint_prior_scale ** 2))
+    eye = np.eye(n_params)
+    for _ in range(n_iter):
+        penalty = np.empty((n_series, n_params))
+        penalty[:, :2] = sigma2[:, None] / 25.0
+        penalty[:, 2:2 + n_cp] = sigma2[:, None] * delta_weight
+        penalty[:, 2 + n_cp:] = sigma2[:, None] / seasonality_prior_scale ** 2
+        # Unused columns are all zero; a unit penalty keeps the system solvable
+        penalty[~column_used] = 1.0
+        coef = np.linalg.solve(XtX + penalty[:, :, None] * eye, Xty[:, :, None])[:, :, 0]
+        residuals = (y - np.einsum("blp,bp->bl", X, coef)) * mask
+        sigma2 = np.maximum((residuals ** 2).sum(axis=1) / n_obs, 1e-10)
+        delta_weight = 1.0 / (changepoint_prior_scale * (np.abs(coef[:, 2:2 + n_cp]) + 1e-4))
+    # Fold the centring back into the offset so the uncentred features used
+    # by prediction.predict_dates give the same fit
+    coef[:, 1] -= np.einsum("bf,bf->b", np.concatenate(fourier_means, axis=1), coef[:, 2 + n_cp:])
+    return coef, np.sqrt(sigma2), n_cp
+
+
+def _compact_model(s, coef, sigma_obs, n_cp, seasonality_prior_scale):
+    n_own = len(s["changepoints_t"])
+    seasonalities = []
+    betas = []
+    col = 2 + n_cp
+    for name, period, order in SEASONALITIES:
+        if s["seasonalities"][name]:
+            seasonalities.append([name, {
+                "period": period,
+                "fourier_order": order,
+                "prior_scale": seasonality_prior_scale,
+                "mode": "additive",
+                "condition_name": None
+            }])
+            betas.append(coef[col:col + 2 * order])
+        col += 2 * order
+    config = {
+        "growth": "linear",
+        "start": str(s["start"]),
+        "t_scale_ns": int(s["t_scale"]),
+        "last_ds": str(s["ds"][-1]),
+        "y_scale": s["y_scale"],
+        "y_min": 0.0,
+        "scaling": "absmax",
+        "seasonalities": seasonalities,
+        "interval_width": 0.8,
+        "uncertainty_samples": 1000,
+        "data_hash": None,
+        "engine": "fastfit"
+    }
+    params = {
+        "k": coef[:1],
+        "m": coef[1:2],
+        "delta": coef[2:2 + n_own],
+        "beta": np.concatenate(betas) if betas else np.zeros(0),
+        "sigma_obs": np.array([sigma_obs])
+    }
+    # Round-trip the config through JSON so it matches a loaded artifact
+    return CompactModel(params, s["changepoints_t"], json.loads(json.dumps(config)))
+
+
+def fit_many(frames, changepoint_prior_scale=0.05, seasonality_prior_scale=10.0, n_changepoints=25,
+             changepoint_range=0.8, n_iter=10, batch_size=64):
+    """
+    Fit a piecewise-linear trend plus Fourier seasonality model to many series at once.
+
+    This is the model Prophet fits (linear growth, automatic yearly, weekly and
+    daily seasonality, same changepoint placement and scaling), solved as batched
+    regularised least squares instead of with Stan. Series are padded to a
+    common length and solved `batch_size` at a time, so hundreds of tickers
+    take one vectorized pass. The results are CompactModels, which
+    prediction.predict_dates, the server and export_model all accept.
+
+    Parameters:
+        frames (dict): DataFrames with ds and y columns, keyed by ticker.
+        changepoint_prior_scale (float): Scale of the Laplace prior on trend changes.
+        seasonality_prior_scale (float): Scale of the normal prior on Fourier terms.
+        n_changepoints (int): Potential changepoints per series.
+        changepoint_range (float): Share of the history where changepoints may sit.
+        n_iter (int): Reweighting iterations for the Laplace prior.
+        batch_size (int): Series solved together; bounds memory.
+
+    Returns:
+        dict: CompactModel per key of `frames`.
+    """
+    keys = list(frames)
+    series = [_prepare(frames[key], n_changepoints, changepoint_range) for key in keys]
+    models = {}
+    for lo in range(0, len(series), batch_size):
+        batch = series[lo:lo + batch_size]
+        coef, sigma_obs, n_cp = _fit_batch(batch, changepoint_prior_scale, seasonality_prior_scale, n_iter)
+        for i, s in enumerate(batch):
+            models[keys[lo + i]] = _compact_model(s, coef[i], sigma_obs[i], n_cp, seasonality_prior_scale)
+    return models
+
+
+def fit(df, **kwargs):
+    """
+    Fit one series; see fit_many for the parameters.
+
+    Returns:
+        CompactModel: The fitted model.
+    """
+    return fit_many({None: df}, **kwargs)[None]
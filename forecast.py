@@ -1,66 +1,181 @@
 import pandas as pd
-from sklearn.model_selection import train_test_split
-from prophet import Prophet
-import plotly.graph_objects as go
+import hashlib
 import logging
 import numpy as np
+import os
+import pickle
+from prediction import last_train_date, predict_dates
+from artifact import CompactModel, artifact_path, export_model
+import fastfit
+from store import DATA_PATH, load_prices
 
 logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
 
-def load_and_split_data(file_path="stocks.csv", ticker="NVDA"):
+ENGINES = ("prophet", "fastfit")
+
+def load_and_split_data(file_path=DATA_PATH, ticker="NVDA"):
     """
-    Load data from CSV and split into training and test sets.
+    Load one ticker's closing prices and split into training and test sets.
 
     Parameters:
-        file_path (str): Path to the CSV file.
+        file_path (str): Price store directory, or a CSV in the stocks.csv schema.
+        ticker (str): Stock ticker symbol.
 
     Returns:
         tuple: Training and test DataFrames.
     """
-    df = pd.read_csv(file_path, parse_dates=["date"])
+    df = load_prices(file_path, ticker, columns=["close"])
     df = df.rename(columns={"date": "ds", "close": "y"})
     df.dropna(inplace=True)
-    df = df[df['ticker'] == ticker]
     train_size = int(len(df) * 0.95)
     train_df = df[:train_size]
     test_df = df[train_size:]
     return train_df, test_df
 
-def train_model(train_df):
+def train_model(train_df, init=None, engine="prophet"):
     """
-    Train a Prophet model.
+    Train a forecasting model.
 
     Parameters:
         train_df (DataFrame): Training data.
+        init (dict): Optional Stan initial values, e.g. from warm_start_params. Ignored by fastfit.
+        engine (str): "prophet" for a Stan fit, or "fastfit" for the NumPy least-squares engine.
 
     Returns:
-        Prophet: Trained Prophet model.
+        Prophet or CompactModel: Trained model, tagged with the data_hash of its training data.
     """
-    model = Prophet(changepoint_prior_scale=0.2)
-    model.fit(train_df)
+    if engine == "fastfit":
+        model = fastfit.fit(train_df, changepoint_prior_scale=0.2)
+    elif engine == "prophet":
+        # Imported here so loading this module for data or prediction helpers
+        # does not pay for prophet and cmdstanpy
+        from prophet import Prophet
+
+        model = Prophet(changepoint_prior_scale=0.2)
+        if init is not None:
+            model.fit(train_df, init=init)
+        else:
+            model.fit(train_df)
+    else:
+        raise ValueError(f"Unknown engine: {engine}. Use one of {ENGINES}")
+    model.data_hash = data_hash(train_df)
     return model
 
-def forecast_with_model(model, days):
+def data_hash(train_df):
     """
-    Use a trained Prophet model to forecast the next X days.
+    Fingerprint the ds and y columns of a training frame.
 
     Parameters:
-        model (Prophet): Trained Prophet model.
+        train_df (DataFrame): Training data.
+
+    Returns:
+        str: Hex digest that changes whenever a date or price changes.
+    """
+    hashed = pd.util.hash_pandas_object(train_df[["ds", "y"]], index=False).to_numpy()
+    return hashlib.sha256(hashed.tobytes()).hexdigest()[:16]
+
+def warm_start_params(model, train_df):
+    """
+    Build Stan initial values from an already fitted model.
+
+    Prophet fits in scaled units (y / y_scale, time / t_scale), so the old
+    parameters are rescaled to the scaling the new fit will use. Prophet falls
+    back to its default init for delta/beta if their shapes no longer match.
+
+    Parameters:
+        model (Prophet or CompactModel): Previously fitted model.
+        train_df (DataFrame): Data the new model will be fit on.
+
+    Returns:
+        dict: Initial k, m, delta, beta and sigma_obs.
+    """
+    y_ratio = 1.0
+    t_ratio = 1.0
+    if getattr(model, "scaling", "absmax") == "absmax":
+        y_ratio = model.y_scale / float(np.abs(train_df["y"]).max())
+        ds = pd.to_datetime(train_df["ds"])
+        t_ratio = (ds.max() - ds.min()).value / np.timedelta64(model.t_scale, "ns").astype(np.int64)
+    params = model.params
+    return {
+        "k": float(np.nanmean(params["k"])) * y_ratio * t_ratio,
+        "m": float(np.nanmean(params["m"])) * y_ratio,
+        "delta": np.nanmean(np.atleast_2d(params["delta"]), axis=0) * y_ratio * t_ratio,
+        "beta": np.nanmean(np.atleast_2d(params["beta"]), axis=0) * y_ratio,
+        "sigma_obs": float(np.nanmean(params["sigma_obs"])) * y_ratio
+    }
+
+def forecast_with_model(model, days, sparse=False, uncertainty=True):
+    """
+    Use a trained model to forecast the next X days.
+
+    Parameters:
+        model (Prophet or CompactModel): Trained model; CompactModels always use the sparse path.
         days (int): Number of days to forecast.
+        sparse (bool): Evaluate only the future dates instead of history plus future.
+        uncertainty (bool): In sparse mode, whether to compute yhat_lower/yhat_upper.
 
     Returns:
         DataFrame: Forecasted data for the requested days.
     """
+    if sparse or isinstance(model, CompactModel):
+        dates = pd.date_range(last_train_date(model), periods=days + 1)[1:]
+        return forecast_dates(model, dates, uncertainty=uncertainty)
     future = model.make_future_dataframe(periods=days)
     forecast = model.predict(future)
     return forecast.tail(days)
 
+def forecast_dates(model, dates, uncertainty=False):
+    """
+    Forecast only the given dates.
+
+    Parameters:
+        model (Prophet): Trained Prophet model.
+        dates (list): Dates to forecast.
+        uncertainty (bool): Whether to compute yhat_lower/yhat_upper.
+
+    Returns:
+        DataFrame: One row per requested date with ds, trend and yhat columns.
+    """
+    return pd.DataFrame(predict_dates(model, dates, uncertainty=uncertainty))
+
+def save_model(model, model_path):
+    """
+    Pickle a model to disk atomically, alongside its compact .npz artifact.
+
+    The model is written to a temporary file next to the target and then
+    renamed over it, so a server polling the file never reads a partial pickle.
+    If the model cannot be exported to the compact format, any stale artifact
+    is removed so loaders fall back to the pickle.
+
+    A CompactModel (e.g. from fastfit) is only written as the .npz artifact,
+    and a stale pickle at model_path is removed so loaders do not pick it up.
+
+    Parameters:
+        model (Prophet or CompactModel): Trained model.
+        model_path (str): Destination path for the pickle.
+    """
+    if isinstance(model, CompactModel):
+        export_model(model, artifact_path(model_path))
+        if os.path.exists(model_path):
+            os.remove(model_path)
+        return
+    tmp_path = f"{model_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(model, f)
+    os.replace(tmp_path, model_path)
+    compact_path = artifact_path(model_path)
+    try:
+        export_model(model, compact_path)
+    except ValueError:
+        if os.path.exists(compact_path):
+            os.remove(compact_path)
+
 ## Visualization function removed. Only prediction values are now returned by the API.
 
 if __name__ == "__main__":
     try:
         # Load and split the data
-        train_df, test_df = load_and_split_data("stocks.csv")
+        train_df, test_df = load_and_split_data()
 
         # Train the model
         model = train_model(train_df)
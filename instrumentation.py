@@ -0,0 +1,217 @@
+import cProfile
+import functools
+import inspect
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# Prediction workers (PREDICT_WORKERS > 0) record their stage timings, cache
+# lookups and model loads in their own processes. prometheus_client's
+# multiprocess mode shares them through files in PROMETHEUS_MULTIPROC_DIR,
+# which has to be set before prometheus_client is imported; workers are
+# spawned after this runs and inherit it.
+if int(os.environ.get("PREDICT_WORKERS", 0)) > 0 and "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="forecaster_metrics_")
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+PROFILE_DIR = os.environ.get("FORECASTER_PROFILE_DIR", "profiles")
+PROFILING_ENABLED = os.environ.get("FORECASTER_PROFILING", "0") == "1"
+
+# Buckets span cache lookups (tens of microseconds) up to full Prophet fits
+STAGE_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_SECONDS = Histogram(
+    "forecaster_stage_seconds", "Time spent in each stage of serving or training", ["stage"],
+    buckets=STAGE_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    "forecaster_request_seconds", "End-to-end handler latency", ["endpoint"], buckets=STAGE_BUCKETS
+)
+IN_FLIGHT = Gauge(
+    "forecaster_requests_in_flight", "Requests currently being handled", ["endpoint"], multiprocess_mode="livesum"
+)
+CACHE_LOOKUPS = Counter(
+    "forecaster_cache_lookups_total", "Forecast cache lookups by tier and outcome", ["tier", "result"]
+)
+MODEL_LOADS = Counter("forecaster_model_loads_total", "Model artifacts read from disk", ["ticker"])
+MODEL_BYTES = Gauge(
+    "forecaster_model_bytes", "Size of the loaded model artifact", ["ticker"], multiprocess_mode="livemax"
+)
+
+
+class Timer:
+    """Wall time of a `timed` block, readable after the block exits."""
+
+    def __init__(self):
+        self.seconds = None
+
+
+@contextmanager
+def timed(stage):
+    """
+    Time a block, record it in the stage histogram and expose the duration.
+
+    Usable anywhere, e.g. around a fit in retraining.py so the same number can
+    also be logged to MLflow:
+
+        with timed("fit") as timer:
+            model.fit(df)
+        mlflow.log_metric("fit_seconds", timer.seconds)
+
+    Parameters:
+        stage (str): Label for the forecaster_stage_seconds histogram.
+
+    Yields:
+        Timer: Its seconds attribute is set when the block exits.
+    """
+    timer = Timer()
+    start = time.perf_counter()
+    try:
+        yield timer
+    finally:
+        timer.seconds = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage).observe(timer.seconds)
+
+
+def record_model_load(ticker, n_bytes):
+    MODEL_LOADS.labels(ticker).inc()
+    MODEL_BYTES.labels(ticker).set(n_bytes)
+
+
+def record_cache(tier, hits, misses):
+    if hits:
+        CACHE_LOOKUPS.labels(tier, "hit").inc(hits)
+    if misses:
+        CACHE_LOOKUPS.labels(tier, "miss").inc(misses)
+
+
+class RequestProfiler:
+    """
+    Capture a cProfile of the next N forecast jobs on demand.
+
+    Arming the profiler starts a fresh profile; each forecast job in this
+    process then runs under it (one at a time, concurrent jobs are not
+    profiled) until N have been captured, and the stats are written to a
+    .prof file that `python -m pstats` or snakeviz can open. Jobs that run in
+    prediction worker processes are not seen by the server's profiler, so the
+    server refuses to arm it when it runs with workers.
+    """
+
+    def __init__(self, profile_dir=PROFILE_DIR):
+        self.profile_dir = profile_dir
+        self.last_path = None
+        self._profile = None
+        self._path = None
+        self._remaining = 0
+        self._busy = False
+        self._lock = threading.Lock()
+
+    def arm(self, n_requests):
+        """
+        Start profiling the next `n_requests` requests.
+
+        Returns:
+            str: Path the profile will be written to.
+        """
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, f"requests_{time.strftime('%Y%m%d_%H%M%S')}.prof")
+        with self._lock:
+            self._profile = cProfile.Profile()
+            self._path = path
+            self._remaining = n_requests
+        return path
+
+    def status(self):
+        with self._lock:
+            return {"remaining": self._remaining, "path": self._path, "last_path": self.last_path}
+
+    @contextmanager
+    def capture(self):
+        with self._lock:
+            profile = self._profile if self._remaining > 0 and not self._busy else None
+            if profile is not None:
+                self._busy = True
+        if profile is None:
+            yield
+            return
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            with self._lock:
+                self._busy = False
+                self._remaining -= 1
+                if self._remaining == 0:
+                    profile.dump_stats(self._path)
+                    self.last_path = self._path
+                    self._profile = None
+
+
+profiler = RequestProfiler()
+
+
+def instrumented(endpoint):
+    """
+    Decorate a FastAPI handler with latency and in-flight request metrics.
+
+    Works on sync and async handlers and keeps the handler's signature, so
+    FastAPI still sees its parameters. Profiling is not done here: cProfile
+    only sees the thread it is enabled in, so the code that does the work
+    wraps itself in profiler.capture().
+
+    Parameters:
+        endpoint (str): Label for the request metrics.
+    """
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with _track_request(endpoint):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _track_request(endpoint):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def _track_request(endpoint):
+    gauge = IN_FLIGHT.labels(endpoint)
+    gauge.inc()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - start)
+        gauge.dec()
+
+
+def metrics_payload():
+    """
+    Return the Prometheus exposition text and its content type.
+
+    In multiprocess mode the metrics of every process are read back from
+    PROMETHEUS_MULTIPROC_DIR and merged.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return generate_latest(), CONTENT_TYPE_LATEST
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid):
+    """
+    Drop the live gauges of a stopped worker process from the multiprocess metrics.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,328 @@
+import threading
+import numpy as np
+
+NS_PER_DAY = 24 * 60 * 60 * 10**9
+
+
+def to_datetime64(dates):
+    """
+    Convert dates (strings, datetimes, Timestamps or datetime64) to a datetime64[ns] array.
+
+    Parameters:
+        dates (array-like or scalar): Dates to convert.
+
+    Returns:
+        ndarray: One-dimensional datetime64[ns] array.
+    """
+    return np.atleast_1d(np.asarray(dates, dtype="datetime64[ns]"))
+
+
+def last_train_date(model):
+    """
+    Return the last date the model was trained on.
+
+    Parameters:
+        model (Prophet): Trained Prophet model.
+
+    Returns:
+        datetime: Last date in the training history.
+    """
+    last_ds = getattr(model, "last_ds", None)
+    if last_ds is not None:
+        return last_ds.astype("datetime64[us]").item()
+    return model.history["ds"].max().to_pydatetime()
+
+
+def supports_fast_path(model):
+    """
+    Check whether a model can be evaluated with the vectorized NumPy path.
+
+    Holidays, extra regressors, conditional seasonalities and logistic growth
+    need extra input columns, and MCMC fits need per-draw parameters, so those
+    models go through Prophet's own predict.
+
+    Parameters:
+        model (Prophet): Trained Prophet model.
+
+    Returns:
+        bool: True if predict_dates can evaluate the model without Prophet.
+    """
+    if model.growth not in ("linear", "flat") or getattr(model, "mcmc_samples", 0):
+        return False
+    if getattr(model, "holidays", None) is not None or getattr(model, "country_holidays", None):
+        return False
+    if getattr(model, "extra_regressors", None):
+        return False
+    return all(props.get("condition_name") is None for props in model.seasonalities.values())
+
+
+def _scaled_time(model, ds):
+    start = np.datetime64(model.start, "ns")
+    t_scale = np.timedelta64(model.t_scale, "ns").astype(np.int64)
+    return (ds - start).astype(np.int64) / t_scale
+
+
+def _trend(model, t):
+    k = np.nanmean(model.params["k"])
+    m = np.nanmean(model.params["m"])
+    if model.growth == "flat":
+        return np.full_like(t, m)
+    deltas = np.nanmean(np.atleast_2d(model.params["delta"]), axis=0)
+    changepoints_t = np.asarray(model.changepoints_t, dtype=float)
+    # Each changepoint adds its rate change from the moment t passes it
+    active = t[:, None] >= changepoints_t[None, :]
+    return (k + active @ deltas) * t + (m + active @ (-changepoints_t * deltas))
+
+
+def _floor(model):
+    if getattr(model, "scaling", "absmax") == "minmax":
+        return model.y_min
+    return 0.0
+
+
+def _seasonal_terms(model, ds):
+    days = ds.astype(np.int64) / NS_PER_DAY
+    features = []
+    modes = []
+    for props in model.seasonalities.values():
+        order = np.arange(1, props["fourier_order"] + 1)
+        x = 2 * np.pi * days[:, None] * order[None, :] / props["period"]
+        block = np.empty((len(days), 2 * len(order)))
+        block[:, 0::2] = np.sin(x)
+        block[:, 1::2] = np.cos(x)
+        features.append(block)
+        modes.extend([props["mode"]] * block.shape[1])
+    if not features:
+        zeros = np.zeros(len(days))
+        return zeros, zeros
+    X = np.hstack(features)
+    beta = np.nanmean(np.atleast_2d(model.params["beta"]), axis=0)
+    multiplicative = np.array([mode == "multiplicative" for mode in modes])
+    additive_terms = X[:, ~multiplicative] @ beta[~multiplicative] * model.y_scale
+    multiplicative_terms = X[:, multiplicative] @ beta[multiplicative]
+    return additive_terms, multiplicative_terms
+
+
+def _sample_yhat(model, t, additive_terms, multiplicative_terms, n_samples, rng, chunk_size=100):
+    """Simulate yhat paths the way Prophet's predict_uncertainty does for MAP fits."""
+    base = _trend(model, t)
+    T = t.max()
+    yhat = np.empty((n_samples, len(t)))
+    for lo in range(0, n_samples, chunk_size):
+        n = min(chunk_size, n_samples - lo)
+        trend = np.tile(base, (n, 1))
+        if model.growth == "linear" and T > 1:
+            # Future changepoints arrive at the historical rate with Laplace
+            # distributed rate changes scaled by the fitted deltas
+            deltas = np.nanmean(np.atleast_2d(model.params["delta"]), axis=0)
+            scale = np.mean(np.abs(deltas)) + 1e-8
+            n_changes = rng.poisson(len(model.changepoints_t) * (T - 1), size=n)
+            width = max(int(n_changes.max()), 1)
+            changepoints = 1 + rng.random((n, width)) * (T - 1)
+            new_deltas = rng.laplace(0, scale, (n, width))
+            new_deltas[np.arange(width)[None, :] >= n_changes[:, None]] = 0.0
+            ramps = np.maximum(t[None, None, :] - changepoints[:, :, None], 0.0)
+            trend += np.einsum("sj,sjt->st", new_deltas, ramps)
+        trend = trend * model.y_scale + _floor(model)
+        sigma = np.nanmean(model.params["sigma_obs"])
+        noise = rng.normal(0, sigma, (n, len(t))) * model.y_scale
+        yhat[lo:lo + n] = trend * (1 + multiplicative_terms) + additive_terms + noise
+    return yhat
+
+
+class TrendDraws:
+    """
+    The random part of the uncertainty simulation, drawn once per model and reused.
+
+    _sample_yhat draws fresh future changepoints, rate changes and noise for
+    every call. This keeps them instead: per sample, the future changepoints
+    out to scaled time `max_t` with their rate changes, and one standard
+    normal noise draw. A sample's trend change at t is the sum of
+    delta * (t - c) over its changepoints c before t. Changepoints are kept
+    sorted by time, so a call only reads those before its last date, and
+    bucketing them by the requested dates and taking cumulative sums
+    evaluates every sample at every date in one vectorized pass. Intervals
+    then cost about as much as the point forecast.
+
+    Draws are made in blocks of SAMPLE_BLOCK samples by one unit of scaled
+    time (one history length), each from its own generator seeded by `seed`
+    and the block's position. Asking for more samples or a later date adds
+    blocks without changing the ones already drawn, so the interval for a
+    date depends only on the seed and the sample count: processes that load
+    the same model with the same seed answer identically, whatever they were
+    asked before. A smaller sample count uses a prefix of the samples.
+
+    A sample's noise draw is shared by all dates. Per-date quantiles, which
+    is all an interval needs, have the same distribution as with
+    _sample_yhat; only the correlation between dates differs.
+
+    The draws grow with samples times how far ahead they reach, so
+    `max_bytes` bounds them: a call that would need more raises ValueError
+    instead of drawing.
+    """
+
+    SAMPLE_BLOCK = 500
+
+    def __init__(self, model, seed=None, max_bytes=None):
+        self.model = model
+        self.seed = seed if seed is not None else np.random.SeedSequence().entropy
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._state = None
+
+    @property
+    def nbytes(self):
+        """Memory held by the current draws."""
+        state = self._state
+        if state is None:
+            return 0
+        return sum(value.nbytes for value in state.values() if isinstance(value, np.ndarray))
+
+    def _extent(self, n_samples, max_t):
+        # Whole sample blocks, and whole units of scaled time past the history (at least one)
+        n_blocks = -(-n_samples // self.SAMPLE_BLOCK)
+        n_spans = max(int(np.ceil(max_t - 1)), 1)
+        return n_blocks, n_spans
+
+    def _expected_bytes(self, n_blocks, n_spans):
+        # Per changepoint: sample id, time, delta and delta * time; per sample: noise
+        n_samples = n_blocks * self.SAMPLE_BLOCK
+        n_changes = 0
+        if self.model.growth == "linear":
+            n_changes = n_samples * len(self.model.changepoints_t) * n_spans
+        return 32 * n_changes + 8 * n_samples
+
+    def _draw_block(self, block, span, scale):
+        # Changepoints of samples in `block` that fall in scaled time (1 + span, 2 + span]
+        rng = np.random.default_rng([self.seed, block, span])
+        n_changes = rng.poisson(len(self.model.changepoints_t), size=self.SAMPLE_BLOCK)
+        total = int(n_changes.sum())
+        sample = np.repeat(block * self.SAMPLE_BLOCK + np.arange(self.SAMPLE_BLOCK), n_changes)
+        return sample, 1 + span + rng.random(total), rng.laplace(0, scale, total)
+
+    def _draw(self, n_blocks, n_spans):
+        model = self.model
+        deltas = np.nanmean(np.atleast_2d(model.params["delta"]), axis=0)
+        scale = np.mean(np.abs(deltas)) + 1e-8 if len(deltas) else 1e-8
+        if model.growth == "linear":
+            parts = [self._draw_block(block, span, scale) for block in range(n_blocks) for span in range(n_spans)]
+            sample, changepoints, new_deltas = (np.concatenate(values) for values in zip(*parts))
+        else:
+            sample, changepoints, new_deltas = np.empty(0, dtype=int), np.empty(0), np.empty(0)
+        order = np.argsort(changepoints, kind="stable")
+        # Noise has its own generator per block, apart from the changepoint spans
+        noise = [
+            np.random.default_rng([self.seed, block]).standard_normal(self.SAMPLE_BLOCK) for block in range(n_blocks)
+        ]
+        return {
+            "n_samples": n_blocks * self.SAMPLE_BLOCK,
+            "max_t": 1.0 + n_spans,
+            "sample": sample[order],
+            "changepoints": changepoints[order],
+            "deltas": new_deltas[order],
+            "deltas_t": (new_deltas * changepoints)[order],
+            "noise": np.concatenate(noise)
+        }
+
+    def _ensure(self, n_samples, max_t):
+        with self._lock:
+            state = self._state
+            if state is None or state["n_samples"] < n_samples or state["max_t"] < max_t:
+                n_blocks, n_spans = self._extent(n_samples, max_t)
+                if state is not None:
+                    n_blocks = max(n_blocks, state["n_samples"] // self.SAMPLE_BLOCK)
+                    n_spans = max(n_spans, int(round(state["max_t"] - 1)))
+                if self.max_bytes is not None and self._expected_bytes(n_blocks, n_spans) > self.max_bytes:
+                    raise ValueError("Uncertainty interval needs too many draws; ask for fewer samples or nearer dates.")
+                self._state = state = self._draw(n_blocks, n_spans)
+            return state
+
+    def sample_yhat(self, t, additive_terms, multiplicative_terms, n_samples):
+        """Return (n_samples, len(t)) simulated yhat values, like _sample_yhat."""
+        model = self.model
+        state = self._ensure(n_samples, float(t.max()))
+        trend = np.tile(_trend(model, t), (n_samples, 1))
+        # Only changepoints before the last date (and of the samples asked for) matter
+        used = np.searchsorted(state["changepoints"], t.max())
+        sample = state["sample"][:used]
+        keep = sample < n_samples if n_samples < state["n_samples"] else slice(None)
+        changepoints = state["changepoints"][:used][keep]
+        if len(changepoints):
+            order = np.argsort(t, kind="mergesort")
+            sorted_t = t[order]
+            n_dates = len(t)
+            # A changepoint counts for every date after it: put it in the
+            # bucket of the first such date, then accumulate along the dates
+            bucket = np.searchsorted(sorted_t, changepoints, side="right")
+            keys = sample[keep] * (n_dates + 1) + bucket
+            size = n_samples * (n_dates + 1)
+            rate = np.bincount(keys, state["deltas"][:used][keep], size).reshape(n_samples, -1).cumsum(axis=1)
+            offset = np.bincount(keys, state["deltas_t"][:used][keep], size).reshape(n_samples, -1).cumsum(axis=1)
+            trend[:, order] += sorted_t * rate[:, :n_dates] - offset[:, :n_dates]
+        trend = trend * model.y_scale + _floor(model)
+        sigma = np.nanmean(model.params["sigma_obs"])
+        noise = state["noise"][:n_samples, None] * sigma * model.y_scale
+        return trend * (1 + multiplicative_terms) + additive_terms + noise
+
+
+def _predict_with_prophet(model, ds, uncertainty):
+    import pandas as pd
+
+    # Prophet sorts its input, so map the rows back to the requested order
+    order = np.argsort(ds, kind="mergesort")
+    forecast = model.predict(pd.DataFrame({"ds": ds}))
+    columns = ["trend", "yhat"]
+    if uncertainty:
+        columns += ["yhat_lower", "yhat_upper"]
+    result = {"ds": ds}
+    for column in columns:
+        values = np.empty(len(ds))
+        values[order] = forecast[column].to_numpy(dtype=float)
+        result[column] = values
+    return result
+
+
+def predict_dates(model, dates, uncertainty=False, seed=None, draws=None, n_samples=None):
+    """
+    Predict only the requested dates.
+
+    Unlike model.predict(model.make_future_dataframe(...)), this evaluates the
+    trend and seasonality terms for the given timestamps alone, so the cost
+    depends on len(dates) rather than on history length or horizon. Point
+    forecasts skip Prophet's Monte-Carlo uncertainty sampling; pass
+    uncertainty=True to also get yhat_lower and yhat_upper.
+
+    Parameters:
+        model (Prophet): Trained Prophet model.
+        dates (array-like): Dates to forecast, in any order.
+        uncertainty (bool): Whether to compute the uncertainty interval.
+        seed (int): Seed for the uncertainty simulation.
+        draws (TrendDraws): Cached draws of this model to compute the interval
+            from instead of simulating afresh; seed is then ignored.
+        n_samples (int): Simulated paths; defaults to model.uncertainty_samples.
+
+    Returns:
+        dict: Arrays keyed by ds, trend, yhat (and yhat_lower, yhat_upper),
+        aligned with the input dates.
+    """
+    ds = to_datetime64(dates)
+    if not supports_fast_path(model):
+        return _predict_with_prophet(model, ds, uncertainty)
+    t = _scaled_time(model, ds)
+    trend = _trend(model, t) * model.y_scale + _floor(model)
+    additive_terms, multiplicative_terms = _seasonal_terms(model, ds)
+    result = {
+        "ds": ds,
+        "trend": trend,
+        "yhat": trend * (1 + multiplicative_terms) + additive_terms
+    }
+    if uncertainty:
+        n_samples = n_samples or model.uncertainty_samples or 1000
+        if draws is not None:
+            samples = draws.sample_yhat(t, additive_terms, multiplicative_terms, n_samples)
+        else:
+            samples = _sample_yhat(model, t, additive_terms, multiplicative_terms, n_samples, np.random.default_rng(seed))
+        lower_p = 100 * (1.0 - model.interval_width) / 2
+        upper_p = 100 * (1.0 + model.interval_width) / 2
+        result["yhat_lower"], result["yhat_upper"] = np.percentile(samples, [lower_p, upper_p], axis=0)
+    return result
@@ -1,93 +1,160 @@
+import functools
 import pandas as pd
 import os
-import pickle
-from forecast import load_and_split_data, train_model
-import mlflow
+import json
+from forecast import load_and_split_data, train_model, save_model, data_hash, warm_start_params
+from artifact import load_model, resolve_model_path
+from store import DATA_PATH, PriceStore, load_prices
 from datetime import datetime
 import pandas as pd
-from sklearn.metrics import mean_absolute_error
+import numpy as np
+from backtest import rolling_cutoffs, rolling_origin, score_models
+from instrumentation import timed
+from tickers import load_tickers, model_path as prod_model_path
+from tracking import tracker
 
-def train_and_save_model(file_path="stocks.csv", ticker="NVDA", model_path=None):
+RETRAIN_STATE = "models/retrain_state.json"
+BACKTEST_HORIZONS = (1, 5, 10)
+# Champion/challenger origins: weekly over about the last six months
+BACKTEST_CUTOFFS = int(os.environ.get("BACKTEST_CUTOFFS", 26))
+# Processes for the backtest refits; 0 uses every CPU
+BACKTEST_WORKERS = int(os.environ.get("BACKTEST_WORKERS", 0)) or None
+
+
+def model_engine(model):
+    # fastfit records itself in the artifact config; Prophet models and their exports do not
+    return getattr(model, "config", {}).get("engine", "prophet")
+
+
+def backtest_engines(history, engines):
+    """
+    Backtest each engine over rolling origins, refitting it at every cutoff.
+
+    Parameters:
+        history (DataFrame): Full history with ds and y columns.
+        engines (list): Engines to compare (see forecast.ENGINES); duplicates are run once.
+
+    Returns:
+        DataFrame: One row per (engine, horizon) with n, mae, rmse and mape; the model column holds the engine.
+    """
+    cutoffs = rolling_cutoffs(len(history), BACKTEST_CUTOFFS)
+    return pd.concat([
+        rolling_origin(functools.partial(train_model, engine=engine), history, cutoffs, BACKTEST_HORIZONS,
+                       max_workers=BACKTEST_WORKERS, name=engine)
+        for engine in dict.fromkeys(engines)
+    ], ignore_index=True)
+
+
+def train_and_save_model(file_path=DATA_PATH, ticker="NVDA", model_path=None, engine="prophet"):
     # Load and split the data
-    train_df, _ = load_and_split_data(file_path, ticker)
-    # Train the model
-    model = train_model(train_df)
+    train_df, test_df = load_and_split_data(file_path, ticker)
     # Choose best model file name for ticker
     if model_path is None:
-        if ticker == "NVDA":
-            model_path = "models/prophet_NVDA_prod.pkl"
-        elif ticker == "MSFT":
-            model_path = "models/prophet_MSFT_prod.pkl"
-        elif ticker == "PLTR":
-            model_path = "models/prophet_PLTR_prod.pkl"
-    # Evaluate MAE for last 7 days
-    mae = evaluate_mae(file_path=file_path, ticker=ticker, days=7)
-    # Check previous prod model MAE
-    prev_mae = None
-    if os.path.exists(model_path):
-        prev_mae = evaluate_mae(file_path=file_path, ticker=ticker, days=7)
-    # If new model is better (lower MAE) or no previous model, save as prod
-    if prev_mae is None or (mae is not None and mae < prev_mae):
-        with open(model_path, "wb") as f:
-            pickle.dump(model, f)
-        print(f"New model saved to {model_path} (MAE: {mae:.4f})")
+        model_path = prod_model_path(ticker)
+    # Skip the fit when the prod model was trained on exactly this data,
+    # otherwise warm-start the optimizer from the prod model's parameters
+    prod_model = load_model(model_path) if os.path.exists(resolve_model_path(model_path)) else None
+    train_hash = data_hash(train_df)
+    prod_hash = getattr(prod_model, "data_hash", None)
+    if train_hash in (prod_hash, load_retrain_state().get(ticker)):
+        print(f"Training data for {ticker} unchanged since the last fit; skipping retrain")
+        return
+    init = warm_start_params(prod_model, train_df) if prod_model is not None and engine == "prophet" else None
+    # Train the model
+    with timed("fit") as fit_timer:
+        model = train_model(train_df, init=init, engine=engine)
+    print(f"Fitted {ticker} in {fit_timer.seconds:.2f}s ({'warm' if init else 'cold'} start)")
+    save_retrain_state(ticker, train_hash)
+    # Champion/challenger: backtest the candidate's engine and the champion's
+    # over rolling origins, refitting at each cutoff, and compare the mean MAE
+    # over the horizons. With the same engine the scores tie, and the
+    # candidate, trained on newer data, replaces the champion
+    history = pd.concat([train_df, test_df], ignore_index=True)
+    champion_engine = model_engine(prod_model) if prod_model is not None else None
+    with timed("backtest") as backtest_timer:
+        scores = backtest_engines(history, [engine] + ([champion_engine] if champion_engine else []))
+    print(scores.to_string(index=False))
+    summary = scores.dropna(subset=["mae"]).groupby("model")["mae"].mean()
+    mae = summary.get(engine)
+    prev_mae = summary.get(champion_engine) if champion_engine else None
+    # If new model is no worse (MAE) or no previous model, save as prod
+    if prev_mae is None or (mae is not None and mae <= prev_mae):
+        save_model(model, model_path)
+        print(f"New model saved to {model_path} (MAE: {mae if mae is not None else 'N/A'})")
     else:
-        print(f"New model not saved to {model_path} (MAE: {mae:.4f} >= previous MAE: {prev_mae:.4f})")
+        print(f"New model not saved to {model_path} (MAE: {mae if mae is not None else 'N/A'} > previous MAE: {prev_mae:.4f})")
     # Log retrain time
     retrain_time = datetime.now().isoformat()
     with open("retrain_log.txt", "a") as logf:
         logf.write(f"Retrained at {retrain_time}, MAE for {ticker}: {mae if mae is not None else 'N/A'}\n")
-    mlflow.set_experiment("stock_forecaster")
-    with mlflow.start_run(run_name=f"retrain_{retrain_time}"):
-        mlflow.log_param("ticker", ticker)
-        mlflow.log_param("retrain_time", retrain_time)
+    # Queued for the background writer; the data file is stored once per
+    # distinct content and referenced by hash. retrain_log.txt changes on
+    # every retrain and its line is already in the run's params and metrics
+    with tracker.run("stock_forecaster", f"retrain_{retrain_time}") as run:
+        run.log_params({
+            "ticker": ticker,
+            "retrain_time": retrain_time,
+            "warm_start": init is not None,
+            "engine": engine,
+            "champion_engine": champion_engine,
+            "backtest_cutoffs": BACKTEST_CUTOFFS
+        })
+        run.log_metric("fit_seconds", fit_timer.seconds)
+        run.log_metric("backtest_seconds", backtest_timer.seconds)
         if mae is not None:
-            mlflow.log_metric("mae_last_7_days", mae)
+            run.log_metric("backtest_mae", mae)
         if prev_mae is not None:
-            mlflow.log_metric("prev_mae_last_7_days", prev_mae)
-        mlflow.log_artifact(file_path)
-        mlflow.log_artifact("retrain_log.txt")
-
-
-def evaluate_mae(file_path="stocks.csv", ticker="NVDA", days=7):
-    if ticker == "NVDA":
-        model_path = "models/prophet_NVDA_prod.pkl"
-    elif ticker == "MSFT":
-        model_path = "models/prophet_MSFT_prod.pkl"
-    elif ticker == "PLTR":
-        model_path = "models/prophet_PLTR_prod.pkl"
-    else:
-        raise ValueError(f"Unknown ticker: {ticker}")
-    df = pd.read_csv(file_path)
-    with open(model_path, 'rb') as f:
-        model = pickle.load(f)
-    df['ds'] = pd.to_datetime(df['date'])
-    df = df.sort_values('ds')
-    test_df = df[df['ticker'] == ticker].tail(days)
-    # Forecast for the actual test dates
-    future = pd.DataFrame({'ds': test_df['ds']})
-    forecast = model.predict(future)
-    forecast = forecast.set_index('ds')
-    y_true = []
-    y_pred = []
-    for _, row in test_df.iterrows():
-        date = row['ds']
-        actual = row['close']
-        if date in forecast.index:
-            pred = forecast.loc[date]['yhat']
-            # If multiple rows for the same date, take the first
-            if isinstance(pred, pd.Series):
-                pred = pred.iloc[0]
-            y_true.append(actual)
-            y_pred.append(pred)
-    if y_true:
-        mae = mean_absolute_error(y_true, y_pred)
+            run.log_metric("prev_backtest_mae", prev_mae)
+        # The per-horizon table, one step per horizon
+        for row in scores.itertuples():
+            prefix = "" if row.model == engine else "prev_"
+            for metric in ("mae", "rmse", "mape"):
+                if not pd.isna(getattr(row, metric)):
+                    run.log_metric(f"{prefix}backtest_{metric}_by_horizon", getattr(row, metric), step=row.horizon)
+        if os.path.isdir(file_path):
+            run.log_artifact(PriceStore(file_path).partition_path(ticker))
+        else:
+            run.log_artifact(file_path)
+
+
+def load_retrain_state(state_path=RETRAIN_STATE):
+    """
+    Return the data hash of the last fit per ticker, whether or not it was promoted.
+    """
+    try:
+        with open(state_path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_retrain_state(ticker, train_hash, state_path=RETRAIN_STATE):
+    state = load_retrain_state(state_path)
+    state[ticker] = train_hash
+    with open(state_path, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+
+
+def evaluate_mae(file_path=DATA_PATH, ticker="NVDA", days=7):
+    model_path = prod_model_path(ticker)
+    if not os.path.exists(resolve_model_path(model_path)):
+        raise ValueError(f"No prod model for ticker: {ticker}")
+    df = load_prices(file_path, ticker, columns=["close"])
+    df = df.rename(columns={"date": "ds", "close": "y"})
+    model = load_model(model_path)
+    # One step ahead from each of the `days` preceding rows scores the last
+    # `days` dates; a shorter history starts at its first row
+    cutoffs = np.arange(max(len(df) - days, 1) - 1, len(df) - 1)
+    scores = score_models({"prod": model}, df, cutoffs, horizons=(1,))
+    mae = scores["mae"].iloc[0]
+    if not pd.isna(mae):
         print(f"MAE for {ticker} in last {days} days: {mae:.4f}")
         return mae
     else:
-        print("No overlapping dates for evaluation for {ticker}.")
+        print(f"No overlapping dates for evaluation for {ticker}.")
         return None
 
 if __name__ == "__main__":
-    for ticker in ["NVDA", "MSFT", "PLTR"]:
+    for ticker in load_tickers():
         train_and_save_model(ticker=ticker)
+    tracker.flush()
@@ -0,0 +1,153 @@
+import json
+import os
+import sys
+import pandas as pd
+
+DATA_PATH = "data/prices"
+PRICE_COLUMNS = ["date", "open", "high", "low", "close", "volume"]
+INDEX_FILE = "_index.json"
+
+
+class PriceStore:
+    """
+    Daily price bars stored as one Parquet file per ticker.
+
+    Layout:
+        <root>/ticker=<TICKER>/data.parquet
+        <root>/_index.json   {ticker: {"last_date": "YYYY-MM-DD", "rows": n}}
+
+    Readers open only the partition and columns they ask for, and the index
+    answers "what is the last date for this ticker" without touching the data.
+    Writes go to a temporary file that is renamed into place; the store
+    assumes a single writer (the extract job).
+    """
+
+    def __init__(self, root=DATA_PATH):
+        self.root = root
+
+    def partition_path(self, ticker):
+        return os.path.join(self.root, f"ticker={ticker}", "data.parquet")
+
+    def index(self):
+        """
+        Return the per-ticker metadata index.
+
+        Returns:
+            dict: {ticker: {"last_date": str, "rows": int}}, empty if the store is new.
+        """
+        try:
+            with open(os.path.join(self.root, INDEX_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def tickers(self):
+        return sorted(self.index())
+
+    def last_date(self, ticker):
+        """
+        Return the last stored date for a ticker.
+
+        Parameters:
+            ticker (str): Stock ticker symbol.
+
+        Returns:
+            Timestamp: Last date, or None if the ticker has no data.
+        """
+        meta = self.index().get(ticker)
+        if meta is None:
+            return None
+        return pd.Timestamp(meta["last_date"])
+
+    def read(self, ticker, columns=None):
+        """
+        Load one ticker's bars, sorted by date.
+
+        Parameters:
+            ticker (str): Stock ticker symbol.
+            columns (list): Columns to load; "date" is always included. Defaults to all.
+
+        Returns:
+            DataFrame: Bars for the ticker, with a "ticker" column if requested.
+        """
+        wanted = PRICE_COLUMNS if columns is None else list(columns)
+        file_columns = ["date"] + [c for c in wanted if c in PRICE_COLUMNS and c != "date"]
+        path = self.partition_path(ticker)
+        if not os.path.exists(path):
+            df = pd.DataFrame({c: pd.Series(dtype="float64") for c in file_columns})
+            df["date"] = pd.to_datetime(df["date"])
+        else:
+            df = pd.read_parquet(path, columns=file_columns)
+        if columns is None or "ticker" in wanted:
+            df["ticker"] = ticker
+        return df
+
+    def upsert(self, df):
+        """
+        Insert or replace bars, keyed by (ticker, date).
+
+        Rows for a date that already exists overwrite the stored row, so
+        re-running an extract does not create duplicates.
+
+        Parameters:
+            df (DataFrame): Bars in the stocks.csv schema (date, open, high, low, close, volume, ticker).
+
+        Returns:
+            dict: Number of stored rows per ticker after the upsert.
+        """
+        index = self.index()
+        df = df.copy()
+        df["date"] = pd.to_datetime(df["date"])
+        for ticker, new_rows in df.groupby("ticker"):
+            existing = self.read(ticker, columns=PRICE_COLUMNS)
+            combined = pd.concat([existing, new_rows[PRICE_COLUMNS]], ignore_index=True)
+            combined = combined.drop_duplicates(subset="date", keep="last").sort_values("date")
+            path = self.partition_path(ticker)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            combined.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+            index[ticker] = {
+                "last_date": combined["date"].max().strftime("%Y-%m-%d"),
+                "rows": len(combined)
+            }
+        self._write_index(index)
+        return {ticker: meta["rows"] for ticker, meta in index.items()}
+
+    def _write_index(self, index):
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, INDEX_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+
+
+def load_prices(path, ticker, columns=None):
+    """
+    Load one ticker's bars from a price store directory or a legacy CSV file.
+
+    Parameters:
+        path (str): PriceStore root, or a CSV in the stocks.csv schema.
+        ticker (str): Stock ticker symbol.
+        columns (list): Columns to load. Defaults to all.
+
+    Returns:
+        DataFrame: Bars for the ticker sorted by date.
+    """
+    if path.endswith(".csv"):
+        usecols = None if columns is None else list(dict.fromkeys(["date", "ticker", *columns]))
+        df = pd.read_csv(path, parse_dates=["date"], usecols=usecols)
+        df = df[df["ticker"] == ticker].sort_values("date")
+        if columns is not None:
+            df = df[list(dict.fromkeys(["date", *columns]))]
+        return df.reset_index(drop=True)
+    return PriceStore(path).read(ticker, columns=columns)
+
+
+if __name__ == "__main__":
+    # Import a legacy CSV, e.g. `python store.py stocks.csv data/prices`
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else "stocks.csv"
+    store_path = sys.argv[2] if len(sys.argv) > 2 else DATA_PATH
+    rows = PriceStore(store_path).upsert(pd.read_csv(csv_path, parse_dates=["date"]))
+    print(f"Imported {csv_path} into {store_path}: {rows}")
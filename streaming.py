@@ -0,0 +1,470 @@
+import argparse
+import csv
+import os
+import time
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+import fastfit
+from extract import BASE_URL, REQUESTS_PER_MINUTE, TokenBucket, fetch_time_series, make_session, read_api_key
+from forecast import save_model
+from prediction import predict_dates
+from store import PRICE_COLUMNS
+from tickers import is_valid_ticker, load_tickers, model_path
+
+INTRADAY_PATH = "data/intraday"
+# Twelve Data interval names and their bar spacing
+INTERVALS = {
+    "1min": np.timedelta64(1, "m"),
+    "5min": np.timedelta64(5, "m"),
+    "15min": np.timedelta64(15, "m"),
+    "30min": np.timedelta64(30, "m"),
+    "1h": np.timedelta64(1, "h")
+}
+VALUE_COLUMNS = PRICE_COLUMNS[1:]
+
+Bar = namedtuple("Bar", ["ticker", "date", "open", "high", "low", "close", "volume"])
+
+
+def replay_bars(path, speed=None):
+    """
+    Yield bars from a CSV in the stocks.csv schema, one row at a time.
+
+    The file is read line by line, so a replay of any length uses constant
+    memory. Rows must be in time order per ticker.
+
+    Parameters:
+        path (str): CSV with date, open, high, low, close, volume and ticker columns.
+        speed (float): Replay this many times faster than real time; None replays as fast as possible.
+
+    Yields:
+        Bar: One bar per row.
+    """
+    previous = None
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            timestamp = np.datetime64(row["date"], "ns")
+            if speed and previous is not None and timestamp > previous:
+                time.sleep((timestamp - previous) / np.timedelta64(1, "s") / speed)
+            previous = timestamp
+            yield Bar(row["ticker"], timestamp, *(float(row[column]) for column in VALUE_COLUMNS))
+
+
+def poll_bars(tickers, api_key, interval="1min", base_url=BASE_URL, poll_seconds=None, max_polls=None,
+              outputsize=30, requests_per_minute=REQUESTS_PER_MINUTE):
+    """
+    Yield new bars by polling the Twelve Data time_series endpoint.
+
+    Each poll asks for the latest `outputsize` bars per ticker and yields
+    those from the last bar already seen for it onwards, oldest first. The
+    last seen bar is yielded again because it may still have been forming
+    when it was first seen; consumers take it as a revision. Requests
+    share extract.py's pooled session, rate limiter and retry handling;
+    `base_url` can point at a local stub server.
+
+    Parameters:
+        tickers (list): Stock ticker symbols.
+        api_key (str): Twelve Data API key.
+        interval (str): Bar interval, a key of INTERVALS.
+        base_url (str): time_series endpoint.
+        poll_seconds (float): Pause between polls; defaults to the bar interval.
+        max_polls (int): Stop after this many polls; None polls forever.
+        outputsize (int): Bars requested per ticker and poll.
+        requests_per_minute (int): Request quota; None disables throttling.
+
+    Yields:
+        Bar: New bars in time order per ticker, and None after each poll so
+        consumers can act on a complete cycle before the pause.
+    """
+    if poll_seconds is None:
+        poll_seconds = INTERVALS[interval] / np.timedelta64(1, "s")
+    bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+    last_seen = {}
+    polls = 0
+    with make_session(1) as session:
+        while max_polls is None or polls < max_polls:
+            for ticker in tickers:
+                params = {"symbol": ticker, "interval": interval, "outputsize": outputsize, "apikey": api_key}
+                try:
+                    data = fetch_time_series(session, bucket, params, base_url)
+                except Exception as e:
+                    print(f"Error polling {ticker}: {e}")
+                    continue
+                if "values" not in data:
+                    print(f"Error polling {ticker}: {data.get('message', 'Unknown error')}")
+                    continue
+                # Twelve Data returns the newest bar first
+                for value in reversed(data["values"]):
+                    timestamp = np.datetime64(value["datetime"], "ns")
+                    if ticker in last_seen and timestamp < last_seen[ticker]:
+                        continue
+                    last_seen[ticker] = timestamp
+                    yield Bar(ticker, timestamp, *(float(value[column]) for column in VALUE_COLUMNS))
+            yield None
+            polls += 1
+            if max_polls is None or polls < max_polls:
+                time.sleep(poll_seconds)
+
+
+class RingBuffer:
+    """
+    Fixed-capacity window of bars in preallocated NumPy arrays.
+
+    Appending past the capacity overwrites the oldest bar, so memory does not
+    grow with the length of the stream. Bars must arrive in time order; a bar
+    for the latest timestamp replaces it (the provider revising the bar that
+    is still forming), and older bars are dropped.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype="datetime64[ns]")
+        self.values = np.zeros((capacity, len(VALUE_COLUMNS)))
+        self.size = 0
+        self._next = 0
+
+    @property
+    def last_time(self):
+        return self.times[(self._next - 1) % self.capacity] if self.size else None
+
+    def append(self, timestamp, values):
+        """
+        Add a bar.
+
+        Returns:
+            bool: False if the bar was older than the latest one and was dropped.
+        """
+        if self.size:
+            last = (self._next - 1) % self.capacity
+            if timestamp < self.times[last]:
+                return False
+            if timestamp == self.times[last]:
+                self.values[last] = values
+                return True
+        self.times[self._next] = timestamp
+        self.values[self._next] = values
+        self._next = (self._next + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        return True
+
+    def clear(self):
+        self.size = 0
+        self._next = 0
+
+    def arrays(self):
+        """
+        Return copies of the buffered timestamps and values, oldest first.
+        """
+        if self.size < self.capacity:
+            return self.times[:self.size].copy(), self.values[:self.size].copy()
+        order = np.r_[self._next:self.capacity, 0:self._next]
+        return self.times[order], self.values[order]
+
+    def frame(self):
+        times, values = self.arrays()
+        df = pd.DataFrame(values, columns=VALUE_COLUMNS)
+        df.insert(0, "date", times)
+        return df
+
+
+class SegmentStore:
+    """
+    Intraday bars on disk as small Parquet segments, compacted per day.
+
+    Layout:
+        <root>/interval=<interval>/ticker=<TICKER>/day=<YYYY-MM-DD>/part-<n>.parquet
+        <root>/interval=<interval>/ticker=<TICKER>/day=<YYYY-MM-DD>/data.parquet
+
+    Segments are appended as the stream is flushed; once a day has
+    `compact_after` of them they are merged into its data.parquet, keeping
+    the last version of each bar. Like PriceStore, writes go to a temporary
+    file that is renamed into place, and there is a single writer.
+    """
+
+    def __init__(self, root=INTRADAY_PATH, interval="1min", compact_after=8):
+        self.root = root
+        self.interval = interval
+        self.compact_after = compact_after
+
+    def day_path(self, ticker, day):
+        return os.path.join(self.root, f"interval={self.interval}", f"ticker={ticker}", f"day={day}")
+
+    def days(self, ticker):
+        try:
+            names = os.listdir(os.path.dirname(self.day_path(ticker, "")))
+        except FileNotFoundError:
+            return []
+        return sorted(name[len("day="):] for name in names if name.startswith("day="))
+
+    def write_segment(self, ticker, df):
+        """
+        Append one segment of bars from a single day, compacting the day if it has enough segments.
+
+        Parameters:
+            ticker (str): Stock ticker symbol.
+            df (DataFrame): Bars in the price store schema without the ticker column.
+        """
+        day_dir = self.day_path(ticker, str(df["date"].iloc[0].date()))
+        os.makedirs(day_dir, exist_ok=True)
+        path = os.path.join(day_dir, f"part-{time.time_ns():020d}.parquet")
+        df.to_parquet(f"{path}.tmp", index=False)
+        os.replace(f"{path}.tmp", path)
+        if len(self._parts(day_dir)) >= self.compact_after:
+            self.compact(ticker, os.path.basename(day_dir)[len("day="):])
+
+    def _parts(self, day_dir):
+        return sorted(name for name in os.listdir(day_dir) if name.startswith("part-") and name.endswith(".parquet"))
+
+    def compact(self, ticker, day):
+        """
+        Merge a day's segments into its data.parquet.
+        """
+        day_dir = self.day_path(ticker, day)
+        parts = self._parts(day_dir)
+        if not parts:
+            return
+        frames = [pd.read_parquet(os.path.join(day_dir, name)) for name in ["data.parquet"] + parts
+                  if os.path.exists(os.path.join(day_dir, name))]
+        combined = pd.concat(frames, ignore_index=True)
+        combined = combined.drop_duplicates(subset="date", keep="last").sort_values("date")
+        path = os.path.join(day_dir, "data.parquet")
+        combined.to_parquet(f"{path}.tmp", index=False)
+        os.replace(f"{path}.tmp", path)
+        for name in parts:
+            os.remove(os.path.join(day_dir, name))
+
+    def read(self, ticker, day):
+        """
+        Load one day of a ticker's bars, compacted and uncompacted, sorted by time.
+
+        Returns:
+            DataFrame: Bars in the price store schema without the ticker column.
+        """
+        day_dir = self.day_path(ticker, day)
+        names = ["data.parquet"] + self._parts(day_dir)
+        frames = [pd.read_parquet(os.path.join(day_dir, name)) for name in names
+                  if os.path.exists(os.path.join(day_dir, name))]
+        if not frames:
+            return pd.DataFrame(columns=PRICE_COLUMNS)
+        combined = pd.concat(frames, ignore_index=True)
+        return combined.drop_duplicates(subset="date", keep="last").sort_values("date").reset_index(drop=True)
+
+
+class StreamIngestor:
+    """
+    Consume intraday bars into bounded per-ticker windows, persist them and refit models.
+
+    Every ticker keeps the latest `window` bars in a RingBuffer, which is what
+    models are fitted on, and up to `segment_rows` unsaved bars in a second
+    one that is flushed to the SegmentStore when full or when the day
+    changes. Memory is therefore fixed per ticker however long the stream
+    runs. Every `refit_every` new bars a ticker is refitted with fastfit (all
+    due tickers in one batch) and the model is saved where a server started
+    with MODEL_DIR=<model_dir> picks it up and forecasts at bar timestamps.
+    """
+
+    def __init__(self, interval="1min", window=2000, segment_rows=256, refit_every=60,
+                 store_path=INTRADAY_PATH, model_dir=None, max_tickers=500):
+        if interval not in INTERVALS:
+            raise ValueError(f"Unknown interval: {interval}. Choose from {', '.join(INTERVALS)}")
+        self.interval = interval
+        self.step = INTERVALS[interval]
+        self.window = window
+        self.segment_rows = segment_rows
+        self.refit_every = refit_every
+        self.store = SegmentStore(store_path, interval)
+        self.model_dir = model_dir or os.path.join("models", f"intraday_{interval}")
+        self.max_tickers = max_tickers
+        self.windows = {}
+        self.models = {}
+        self._pending = {}
+        self._since_fit = {}
+
+    def _buffers(self, ticker):
+        if ticker not in self.windows:
+            if not is_valid_ticker(ticker):
+                raise ValueError(f"Invalid ticker symbol: {ticker}")
+            if len(self.windows) >= self.max_tickers:
+                raise ValueError(f"Already tracking {self.max_tickers} tickers")
+            self.windows[ticker] = RingBuffer(self.window)
+            self._pending[ticker] = RingBuffer(self.segment_rows)
+            self._since_fit[ticker] = 0
+        return self.windows[ticker], self._pending[ticker]
+
+    def restore(self, tickers):
+        """
+        Refill the windows from the newest stored days, e.g. after a restart.
+
+        Parameters:
+            tickers (list): Stock ticker symbols.
+        """
+        for ticker in tickers:
+            ring, _ = self._buffers(ticker)
+            frames = []
+            rows = 0
+            for day in reversed(self.store.days(ticker)):
+                df = self.store.read(ticker, day)
+                frames.append(df)
+                rows += len(df)
+                if rows >= self.window:
+                    break
+            if not frames:
+                continue
+            df = pd.concat(frames[::-1], ignore_index=True).tail(self.window)
+            for timestamp, values in zip(df["date"].to_numpy(dtype="datetime64[ns]"), df[VALUE_COLUMNS].to_numpy()):
+                ring.append(timestamp, values)
+
+    def add(self, bar):
+        """
+        Add one bar to its ticker's window and unsaved segment.
+
+        A bar with the same timestamp as the ticker's latest one is a revision:
+        it replaces that bar and does not count towards `refit_every`.
+
+        Returns:
+            bool: False if the bar was out of order and was dropped.
+        """
+        ring, pending = self._buffers(bar.ticker)
+        values = np.array(bar[2:], dtype=float)
+        is_new = ring.last_time is None or bar.date > ring.last_time
+        if not ring.append(bar.date, values):
+            return False
+        last = pending.last_time
+        if last is not None and bar.date.astype("datetime64[D]") != last.astype("datetime64[D]"):
+            self._flush(bar.ticker)
+        if pending.size == pending.capacity and bar.date != last:
+            self._flush(bar.ticker)
+        pending.append(bar.date, values)
+        if is_new:
+            self._since_fit[bar.ticker] += 1
+        return True
+
+    def _flush(self, ticker):
+        pending = self._pending[ticker]
+        if pending.size:
+            self.store.write_segment(ticker, pending.frame())
+            pending.clear()
+
+    def flush(self):
+        """Write every ticker's unsaved bars to the segment store."""
+        for ticker in self._pending:
+            self._flush(ticker)
+
+    def refit(self, tickers=None):
+        """
+        Refit tickers on their current windows with fastfit and save the models.
+
+        Parameters:
+            tickers (list): Tickers to refit; defaults to those with `refit_every` new bars.
+
+        Returns:
+            list: Tickers that were refitted.
+        """
+        if tickers is None:
+            tickers = [ticker for ticker, n in self._since_fit.items() if n >= self.refit_every]
+        frames = {}
+        for ticker in tickers:
+            times, values = self.windows[ticker].arrays()
+            if len(times) >= 2:
+                frames[ticker] = pd.DataFrame({"ds": times, "y": values[:, VALUE_COLUMNS.index("close")]})
+        if not frames:
+            return []
+        os.makedirs(self.model_dir, exist_ok=True)
+        for ticker, model in fastfit.fit_many(frames).items():
+            self.models[ticker] = model
+            save_model(model, model_path(ticker, self.model_dir))
+            self._since_fit[ticker] = 0
+        return list(frames)
+
+    def consume(self, bars, max_bars=None):
+        """
+        Ingest bars from a source until it ends, refitting tickers as they become due.
+
+        Tickers that become due are collected and refitted together in one
+        batched refit once the stream moves past their timestamp, a due
+        ticker receives a new bar, or a poll cycle ends (a None from the
+        source).
+
+        Parameters:
+            bars (iterable): Bars, e.g. from replay_bars or poll_bars.
+            max_bars (int): Stop after this many bars; None runs until the source ends.
+
+        Returns:
+            int: Number of bars accepted.
+        """
+        accepted = 0
+        seen = 0
+        due = []
+        due_time = None
+        try:
+            for bar in bars:
+                if bar is not None and max_bars is not None and seen >= max_bars:
+                    break
+                # A due ticker's revised bar is applied before the refit; its next new bar is not
+                if due and (bar is None or bar.date > due_time
+                            or bar.ticker in due and bar.date > self.windows[bar.ticker].last_time):
+                    self.refit(due)
+                    due = []
+                if bar is None:
+                    continue
+                seen += 1
+                if self.add(bar):
+                    accepted += 1
+                    if self._since_fit[bar.ticker] >= self.refit_every and bar.ticker not in due:
+                        due.append(bar.ticker)
+                        due_time = bar.date
+            if due:
+                self.refit(due)
+        finally:
+            self.flush()
+        return accepted
+
+    def forecast(self, ticker, steps=10):
+        """
+        Forecast the next `steps` bars after the end of a ticker's window.
+
+        Bars are assumed to continue at the interval spacing; exchange
+        closures are not skipped.
+
+        Parameters:
+            ticker (str): Stock ticker symbol.
+            steps (int): Number of bars ahead.
+
+        Returns:
+            DataFrame: ds and yhat per future bar timestamp.
+        """
+        if ticker not in self.models:
+            self.refit([ticker])
+        if ticker not in self.models:
+            raise ValueError(f"Not enough bars to forecast {ticker}")
+        dates = self.windows[ticker].last_time + self.step * np.arange(1, steps + 1)
+        forecast = predict_dates(self.models[ticker], dates)
+        return pd.DataFrame({"ds": forecast["ds"], "yhat": forecast["yhat"]})
+
+
+if __name__ == "__main__":
+    # e.g. `python streaming.py --replay bars_1min.csv` or `python streaming.py --interval 5min`
+    parser = argparse.ArgumentParser(description="Ingest intraday bars and keep rolling models up to date.")
+    parser.add_argument("--interval", default="1min", choices=list(INTERVALS))
+    parser.add_argument("--replay", help="CSV of bars in the stocks.csv schema to replay instead of polling")
+    parser.add_argument("--speed", type=float, help="Replay speed-up over real time; default as fast as possible")
+    parser.add_argument("--base-url", default=BASE_URL, help="time_series endpoint to poll")
+    parser.add_argument("--window", type=int, default=2000, help="Bars kept per ticker for fitting")
+    parser.add_argument("--refit-every", type=int, default=60, help="New bars between refits of a ticker")
+    parser.add_argument("--max-bars", type=int, help="Stop after this many bars")
+    args = parser.parse_args()
+
+    ingestor = StreamIngestor(args.interval, window=args.window, refit_every=args.refit_every)
+    if args.replay:
+        source = replay_bars(args.replay, speed=args.speed)
+    else:
+        tickers = load_tickers()
+        ingestor.restore(tickers)
+        source = poll_bars(tickers, read_api_key(), args.interval, base_url=args.base_url)
+    accepted = ingestor.consume(source, max_bars=args.max_bars)
+    print(f"Ingested {accepted} bars for {len(ingestor.windows)} tickers; models in {ingestor.model_dir}")
+    for ticker in ingestor.windows:
+        try:
+            print(ticker, ingestor.forecast(ticker, steps=5).to_string(index=False), sep="\n")
+        except ValueError as e:
+            print(e)
@@ -1,15 +1,15 @@
 import requests
-import logging
-import webbrowser
-logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
 
-url = "http://127.0.0.1:8000/forecast"  
-payload = {"ticker": "NVDA", "forecast_date": "12/31/2025"} 
-response = requests.post(url, json=payload)
+# Manual smoke test against a running server (`uvicorn app.server:app`).
+# For repeatable latency numbers use benchmark.py, which runs in-process.
+if __name__ == "__main__":
+    url = "http://127.0.0.1:8000/forecast"
+    params = {"ticker": "NVDA", "forecast_date": "2025-12-31"}
+    response = requests.get(url, params=params)
 
-if response.status_code == 200:
-    # Print the predicted value
-    print("Predicted value:", response.json().get("predicted_value"))
-else:
-    print(f"Error: {response.status_code}")
-    print(response.json())
\ No newline at end of file
+    if response.status_code == 200:
+        # Print the predicted value
+        print("Predicted value:", response.json().get("predicted_value"))
+    else:
+        print(f"Error: {response.status_code}")
+        print(response.json())
@@ -0,0 +1,83 @@
+import json
+import os
+import sys
+import threading
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+StubRequest = namedtuple("StubRequest", ["method", "path", "query", "json"])
+
+
+class StubServer:
+    """
+    Local HTTP server whose responses come from a function, for testing HTTP clients offline.
+
+    `respond(request)` gets a StubRequest and returns (status, payload) or
+    (status, payload, headers); the payload is sent as JSON, or as is when it
+    is a str. Every request is recorded in `requests`.
+    """
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.requests = []
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self._httpd.server_port}"
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def paths(self):
+        return [request.path for request in self.requests]
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _handle(self):
+                url = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length)) if length else None
+                request = StubRequest(self.command, url.path, parse_qs(url.query), body)
+                server.requests.append(request)
+                status, payload, *rest = server.respond(request)
+                content = (payload if isinstance(payload, str) else json.dumps(payload)).encode()
+                self.send_response(status)
+                content_type = "application/x-ndjson" if isinstance(payload, str) else "application/json"
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(content)))
+                for key, value in (rest[0] if rest else {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = _handle
+            do_POST = _handle
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+@pytest.fixture
+def stub_server():
+    """Start StubServers for a test and stop them afterwards: `server = stub_server(respond)`."""
+    servers = []
+
+    def start(respond):
+        server = StubServer(respond)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import time
+from client import BATCH_TICKERS, AsyncForecastClient, ForecastClient
+
+DATES = ["2025-12-01", "2025-12-02"]
+
+
+def forecaster(paths, saturated=0):
+    """
+    Respond like the forecaster API, offering only `paths` in its OpenAPI schema.
+
+    With paths=None the server predates the schema and only has /forecast.
+    The first `saturated` POSTs to /forecast/batch get a 503 with Retry-After.
+    """
+    state = {"saturated": saturated}
+
+    def respond(request):
+        if request.path == "/openapi.json":
+            if paths is None:
+                return 404, {"detail": "Not Found"}
+            return 200, {"paths": {path: {} for path in paths}}
+        if request.path not in (paths or {"/forecast"}):
+            return 404, {"detail": "Not Found"}
+        if request.path == "/forecast/batch":
+            if state["saturated"]:
+                state["saturated"] -= 1
+                return 503, {"error": "Server is at capacity, retry shortly"}, {"Retry-After": "1"}
+            body = request.json
+            return 200, {"results": [
+                {"ticker": ticker, "date": date, "predicted_value": 1.0}
+                for ticker in body["tickers"] for date in body["forecast_dates"]
+            ]}
+        if request.path == "/forecast/range":
+            rows = [
+                {"ticker": ticker, "ds": "2025-12-01", "yhat": 1.0, "yhat_lower": 0.5, "yhat_upper": 1.5}
+                for ticker in request.query["ticker"]
+            ]
+            return 200, "".join(json.dumps(row) + "\n" for row in rows)
+        ticker, date = request.query["ticker"][0], request.query["forecast_date"][0]
+        if ticker == "NOPE":
+            return 200, {"error": f"No model available for ticker {ticker}"}
+        return 200, {"ticker": ticker, "date": date, "predicted_value": 2.0}
+
+    return respond
+
+
+def test_batch_is_retried_after_a_503(stub_server):
+    server = stub_server(forecaster({"/forecast", "/forecast/batch"}, saturated=1))
+    start = time.monotonic()
+    with ForecastClient(server.url, backoff=0.01) as client:
+        results = client.forecast_many(["NVDA", "MSFT"], DATES)
+    assert [(result["ticker"], result["date"]) for result in results] == [
+        ("NVDA", DATES[0]), ("NVDA", DATES[1]), ("MSFT", DATES[0]), ("MSFT", DATES[1])
+    ]
+    assert server.paths().count("/forecast/batch") == 2
+    assert time.monotonic() - start >= 1
+
+
+def test_batch_is_split_into_chunks_the_server_admits(stub_server):
+    server = stub_server(forecaster({"/forecast", "/forecast/batch"}))
+    tickers = [f"T{i}" for i in range(BATCH_TICKERS + 4)]
+    with ForecastClient(server.url) as client:
+        results = client.forecast_many(tickers, DATES[:1])
+    assert [result["ticker"] for result in results] == tickers
+    batches = [request.json["tickers"] for request in server.requests if request.path == "/forecast/batch"]
+    assert [len(batch) for batch in batches] == [BATCH_TICKERS, 4]
+
+
+def test_falls_back_to_single_forecasts_without_batch_endpoint(stub_server):
+    server = stub_server(forecaster(None))
+    with ForecastClient(server.url) as client:
+        results = client.forecast_many(["NVDA", "NOPE"], DATES)
+    assert server.paths().count("/forecast") == 4
+    assert results[0] == {"ticker": "NVDA", "date": DATES[0], "predicted_value": 2.0}
+    # Single-call errors get the ticker and date a batch result would carry
+    assert results[2] == {"ticker": "NOPE", "date": DATES[0], "error": "No model available for ticker NOPE"}
+
+
+def test_range_streams_rows_when_available(stub_server):
+    server = stub_server(forecaster({"/forecast", "/forecast/range"}))
+    with ForecastClient(server.url) as client:
+        rows = list(client.forecast_range(["NVDA", "MSFT"], "2025-12-01", horizon=1))
+    assert [row["ticker"] for row in rows] == ["NVDA", "MSFT"]
+    assert rows[0]["yhat_lower"] == 0.5
+    assert "/forecast" not in server.paths()
+
+
+def test_range_is_rebuilt_from_point_forecasts_on_older_servers(stub_server):
+    server = stub_server(forecaster({"/forecast"}))
+    with ForecastClient(server.url) as client:
+        rows = list(client.forecast_range(["NVDA"], "2025-12-01", end_date="2025-12-03"))
+    assert [row["ds"] for row in rows] == ["2025-12-01", "2025-12-02", "2025-12-03"]
+    assert all(row["yhat"] == 2.0 and row["yhat_lower"] is None for row in rows)
+
+
+def test_async_client_retries_and_chunks(stub_server):
+    server = stub_server(forecaster({"/forecast", "/forecast/batch"}, saturated=1))
+    tickers = [f"T{i}" for i in range(BATCH_TICKERS + 1)]
+
+    async def run():
+        async with AsyncForecastClient(server.url, backoff=0.01) as client:
+            return await client.forecast_many(tickers, DATES[:1])
+
+    results = asyncio.run(run())
+    assert [result["ticker"] for result in results] == tickers
+    # One rejected and two admitted chunks
+    assert server.paths().count("/forecast/batch") == 3
+
+
+def test_async_client_falls_back_to_single_forecasts(stub_server):
+    server = stub_server(forecaster(None))
+
+    async def run():
+        async with AsyncForecastClient(server.url) as client:
+            many = await client.forecast_many(["NVDA"], DATES)
+            rows = [row async for row in client.forecast_range(["NVDA"], "2025-12-01", horizon=2)]
+            return many, rows
+
+    many, rows = asyncio.run(run())
+    assert [result["predicted_value"] for result in many] == [2.0, 2.0]
+    assert [row["ds"] for row in rows] == ["2025-12-01", "2025-12-02"]
+    assert server.paths().count("/forecast") == 4
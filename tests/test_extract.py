@@ -0,0 +1,87 @@
+import time
+import pytest
+import requests
+from extract import TokenBucket, fetch_time_series, make_session
+
+PARAMS = {"symbol": "NVDA", "interval": "1day", "outputsize": 2, "apikey": "test"}
+VALUES = {"values": [{"datetime": "2025-09-30", "open": "1", "high": "2", "low": "0.5", "close": "1.5",
+                      "volume": "100"}]}
+
+
+def scripted(*responses):
+    # Answer the n-th request with the n-th response, repeating the last one
+    remaining = list(responses)
+
+    def respond(request):
+        return remaining.pop(0) if len(remaining) > 1 else remaining[0]
+
+    return respond
+
+
+def test_retries_server_errors_until_success(stub_server):
+    server = stub_server(scripted((500, {}), (502, {}), (200, VALUES)))
+    with make_session(1) as session:
+        data = fetch_time_series(session, None, PARAMS, server.url, retries=3, backoff=0.01)
+    assert data == VALUES
+    assert len(server.requests) == 3
+    assert server.requests[0].query["symbol"] == ["NVDA"]
+
+
+def test_retries_quota_error_reported_in_body(stub_server):
+    # Twelve Data answers an exhausted quota with HTTP 200 and code 429 in the body
+    server = stub_server(scripted((200, {"code": 429, "message": "quota"}), (200, VALUES)))
+    with make_session(1) as session:
+        data = fetch_time_series(session, None, PARAMS, server.url, retries=1, backoff=0.01)
+    assert data == VALUES
+    assert len(server.requests) == 2
+
+
+def test_honours_retry_after(stub_server):
+    server = stub_server(scripted((429, {}, {"Retry-After": "1"}), (200, VALUES)))
+    start = time.monotonic()
+    with make_session(1) as session:
+        data = fetch_time_series(session, None, PARAMS, server.url, retries=1, backoff=0.01)
+    assert data == VALUES
+    # The backoff alone would have waited 10 ms
+    assert time.monotonic() - start >= 1
+
+
+def test_raises_once_retries_are_exhausted(stub_server):
+    server = stub_server(scripted((503, {})))
+    with make_session(1) as session:
+        with pytest.raises(requests.HTTPError):
+            fetch_time_series(session, None, PARAMS, server.url, retries=2, backoff=0.01)
+    assert len(server.requests) == 3
+
+
+def test_returns_last_quota_error_once_retries_are_exhausted(stub_server):
+    server = stub_server(scripted((200, {"code": 429, "message": "quota"})))
+    with make_session(1) as session:
+        data = fetch_time_series(session, None, PARAMS, server.url, retries=1, backoff=0.01)
+    assert data["code"] == 429
+    assert len(server.requests) == 2
+
+
+def test_token_bucket_allows_a_burst_then_throttles():
+    # 600 per minute is one token every 100 ms after a burst of 2
+    bucket = TokenBucket(600, capacity=2)
+    start = time.monotonic()
+    bucket.acquire()
+    bucket.acquire()
+    burst = time.monotonic() - start
+    bucket.acquire()
+    bucket.acquire()
+    elapsed = time.monotonic() - start
+    assert burst < 0.05
+    assert 0.18 <= elapsed < 1
+
+
+def test_requests_wait_for_the_rate_limiter(stub_server):
+    server = stub_server(scripted((200, VALUES)))
+    bucket = TokenBucket(600, capacity=1)
+    start = time.monotonic()
+    with make_session(1) as session:
+        for _ in range(3):
+            fetch_time_series(session, bucket, PARAMS, server.url)
+    assert len(server.requests) == 3
+    assert time.monotonic() - start >= 0.18
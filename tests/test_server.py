@@ -0,0 +1,46 @@
+import asyncio
+import time
+import numpy as np
+import pandas as pd
+import pytest
+import fastfit
+from forecast import save_model
+from prediction import predict_dates
+from tickers import model_path
+from app.server import ModelRegistry, PredictionPool
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    rng = np.random.default_rng(0)
+    ds = pd.bdate_range(end="2025-09-30", periods=300)
+    y = 100 * np.exp(np.cumsum(rng.normal(0.0005, 0.02, len(ds))))
+    save_model(fastfit.fit(pd.DataFrame({"ds": ds, "y": y})), model_path("NVDA", str(tmp_path)))
+    return str(tmp_path)
+
+
+def test_separately_loaded_models_give_identical_intervals(model_dir):
+    # Like two prediction workers: each loads the artifact itself, and one
+    # has already served a far date with more samples (growing its draws)
+    first = ModelRegistry(model_dir).get("NVDA")
+    second = ModelRegistry(model_dir).get("NVDA")
+    predict_dates(second.model, ["2028-06-30"], uncertainty=True, draws=second.draws, n_samples=1700)
+    dates = pd.date_range("2025-10-01", periods=60)
+    intervals = [
+        predict_dates(entry.model, dates, uncertainty=True, draws=entry.draws)
+        for entry in (first, second)
+    ]
+    assert first.version == second.version
+    assert first.draws is not second.draws
+    np.testing.assert_array_equal(intervals[0]["yhat_lower"], intervals[1]["yhat_lower"])
+    np.testing.assert_array_equal(intervals[0]["yhat_upper"], intervals[1]["yhat_upper"])
+    assert (intervals[0]["yhat_lower"] < intervals[0]["yhat"]).all()
+
+
+def test_in_process_requests_queue_instead_of_getting_503():
+    pool = PredictionPool(workers=0, max_pending=1)
+
+    async def run():
+        return await asyncio.gather(*(pool.run(time.sleep, [(0.05,)]) for _ in range(3)))
+
+    assert asyncio.run(run()) == [[None]] * 3
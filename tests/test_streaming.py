@@ -0,0 +1,21 @@
+import numpy as np
+from streaming import Bar, StreamIngestor
+
+
+def bar(minute, close):
+    return Bar("NVDA", np.datetime64(f"2025-12-01T14:{minute:02d}", "ns"), close, close, close, close, 100.0)
+
+
+def test_revised_last_bar_replaces_and_does_not_advance_the_refit_counter(tmp_path):
+    ingestor = StreamIngestor(window=10, refit_every=5, store_path=str(tmp_path / "intraday"),
+                              model_dir=str(tmp_path / "models"))
+    assert ingestor.add(bar(30, 1.0))
+    assert ingestor.add(bar(31, 2.0))
+    assert ingestor.add(bar(31, 2.5))
+    assert not ingestor.add(bar(30, 9.0))
+    window = ingestor.windows["NVDA"].frame()
+    assert list(window["close"]) == [1.0, 2.5]
+    assert ingestor._since_fit["NVDA"] == 2
+    ingestor.flush()
+    # The unsaved segment kept the revision too
+    assert list(ingestor.store.read("NVDA", "2025-12-01")["close"]) == [1.0, 2.5]
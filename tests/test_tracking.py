@@ -0,0 +1,24 @@
+import pytest
+from mlflow.tracking import MlflowClient
+from tracking import ArtifactStore, Tracker
+
+
+def test_run_that_raises_is_written_as_failed(tmp_path):
+    tracking_uri = "file:" + str(tmp_path / "mlruns")
+    tracker = Tracker(tracking_uri, ArtifactStore(str(tmp_path / "artifacts")))
+    with pytest.raises(RuntimeError):
+        with tracker.run("experiment", "broken") as run:
+            run.log_params({"engine": "fastfit"})
+            run.log_metric("backtest_mae", 1.5)
+            run.log_artifact(str(tmp_path / "never_written.npz"))
+            raise RuntimeError("fit failed")
+    with tracker.run("experiment", "fine") as run:
+        run.log_metric("backtest_mae", 1.0)
+    tracker.flush()
+    client = MlflowClient(tracking_uri)
+    experiment = client.get_experiment_by_name("experiment")
+    runs = {run.info.run_name: run for run in client.search_runs([experiment.experiment_id])}
+    assert runs["broken"].info.status == "FAILED"
+    assert runs["broken"].data.metrics == {"backtest_mae": 1.5}
+    assert runs["broken"].data.params == {"engine": "fastfit"}
+    assert runs["fine"].info.status == "FINISHED"
@@ -0,0 +1,63 @@
+import json
+import os
+import re
+
+TICKERS_FILE = "tickers.json"
+DEFAULT_TICKERS = ["NVDA", "MSFT", "PLTR"]
+MODEL_DIR = os.environ.get("MODEL_DIR", "models")
+TICKER_PATTERN = re.compile(r"^[A-Za-z0-9.\-]{1,15}$")
+PROD_MODEL_PATTERN = re.compile(r"^prophet_(.+)_prod\.(pkl|npz)$")
+
+
+def load_tickers(path=TICKERS_FILE):
+    """
+    Return the tickers the pipeline tracks, read from the JSON manifest.
+
+    Parameters:
+        path (str): Path to a JSON list of ticker symbols.
+
+    Returns:
+        list: Ticker symbols, or DEFAULT_TICKERS if the manifest is missing.
+    """
+    try:
+        with open(path) as f:
+            return list(json.load(f))
+    except FileNotFoundError:
+        return list(DEFAULT_TICKERS)
+
+
+def is_valid_ticker(ticker):
+    # Tickers become part of file paths, so only allow symbol characters
+    return bool(TICKER_PATTERN.match(ticker))
+
+
+def model_path(ticker, model_dir=MODEL_DIR):
+    """
+    Return the prod model path for a ticker.
+
+    Parameters:
+        ticker (str): Stock ticker symbol.
+        model_dir (str): Directory holding the prod models.
+
+    Returns:
+        str: Path of the ticker's prod .pkl (the .npz artifact sits next to it).
+    """
+    return f"{model_dir}/prophet_{ticker}_prod.pkl"
+
+
+def discover_tickers(model_dir=MODEL_DIR):
+    """
+    Return every ticker that has a prod model in the models directory.
+
+    Parameters:
+        model_dir (str): Directory holding the prod models.
+
+    Returns:
+        list: Sorted ticker symbols, empty if the directory does not exist.
+    """
+    try:
+        names = os.listdir(model_dir)
+    except FileNotFoundError:
+        return []
+    found = {match.group(1) for match in map(PROD_MODEL_PATTERN.match, names) if match}
+    return sorted(ticker for ticker in found if is_valid_ticker(ticker))
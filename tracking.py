@@ -0,0 +1,237 @@
+import atexit
+import hashlib
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+TRACKING_URI = os.environ.get("MLFLOW_TRACKING_URI", "file:" + os.path.abspath("mlruns"))
+ARTIFACT_STORE = os.environ.get("TRACKING_ARTIFACT_STORE", "mlartifacts")
+# MLflow's limits for a single log_batch call
+MAX_METRICS_PER_BATCH = 1000
+MAX_PARAMS_PER_BATCH = 100
+MAX_TAGS_PER_BATCH = 100
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+class RunRecord:
+    """
+    Params, metrics and artifacts of one run, collected in memory.
+
+    Logging calls only append to lists; nothing touches MLflow or the disk
+    until the run is handed to the Tracker's background writer.
+    """
+
+    def __init__(self, experiment, run_name):
+        self.experiment = experiment
+        self.run_name = run_name
+        self.params = {}
+        self.metrics = []
+        self.artifacts = []
+        self.start_ms = _now_ms()
+        self.end_ms = None
+        self.status = "FINISHED"
+
+    def log_param(self, key, value):
+        self.params[key] = value
+
+    def log_params(self, params):
+        self.params.update(params)
+
+    def log_metric(self, key, value, step=0):
+        self.metrics.append((key, float(value), _now_ms(), step))
+
+    def log_artifact(self, path):
+        self.artifacts.append(path)
+
+
+class ArtifactStore:
+    """
+    Content-addressed artifact storage: each distinct file content is stored once.
+
+    Layout:
+        <root>/<sha256[:2]>/<sha256>/<file name>
+
+    Runs reference artifacts by hash, so logging an unchanged dataset on every
+    retrain stores nothing new. Hashes are cached by (path, mtime, size), so an
+    unchanged file is not even re-read within a process.
+    """
+
+    def __init__(self, root=ARTIFACT_STORE):
+        self.root = root
+        self._hashes = {}
+
+    def blob_path(self, digest, name):
+        return os.path.join(self.root, digest[:2], digest, name)
+
+    def _file_hash(self, path):
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        digest = self._hashes.get(key)
+        if digest is None:
+            sha = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    sha.update(chunk)
+            digest = sha.hexdigest()
+            self._hashes[key] = digest
+        return digest
+
+    def put(self, path):
+        """
+        Store a file unless its content is already present.
+
+        Parameters:
+            path (str): File to store.
+
+        Returns:
+            tuple: (sha256 hex digest, stored path, whether the content was new).
+        """
+        name = os.path.basename(path)
+        digest = self._file_hash(path)
+        target = self.blob_path(digest, name)
+        if os.path.exists(target):
+            return digest, target, False
+        # Copy while hashing: if the file changed since it was hashed, the
+        # blob is stored under the hash of what was actually copied
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = os.path.join(self.root, f".{digest}.{threading.get_ident()}.tmp")
+        sha = hashlib.sha256()
+        with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+            for chunk in iter(lambda: src.read(1 << 20), b""):
+                sha.update(chunk)
+                dst.write(chunk)
+        digest = sha.hexdigest()
+        target = self.blob_path(digest, name)
+        if os.path.exists(target):
+            os.remove(tmp_path)
+            return digest, target, False
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(tmp_path, target)
+        return digest, target, True
+
+
+class Tracker:
+    """
+    Experiment tracking that keeps MLflow I/O off the training path.
+
+    `with tracker.run(...) as run:` collects params, metrics and artifact
+    paths in memory. When the block exits the run is queued, and one
+    background thread writes it: artifacts go to the content-addressed
+    ArtifactStore, and params, metrics and artifact hashes (as
+    `artifact.<name>` tags) go to MLflow in batched log_batch calls. Call
+    flush() to wait for pending writes. It also runs at interpreter exit, but
+    not when a process ends through os._exit, as Airflow task runners do, so
+    entry points flush before they return.
+    """
+
+    def __init__(self, tracking_uri=TRACKING_URI, artifact_store=None):
+        self.tracking_uri = tracking_uri
+        self.artifact_store = artifact_store or ArtifactStore()
+        self._queue = queue.Queue()
+        self._client = None
+        self._experiments = {}
+        self._thread = None
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    @contextmanager
+    def run(self, experiment, run_name):
+        """
+        Collect one run and queue it for writing when the block exits.
+
+        Artifact files are read by the writer thread, so they should not be
+        rewritten until flush() returns. If the block raises, the run is still
+        written, as FAILED, with whatever it logged, and the exception propagates.
+
+        Parameters:
+            experiment (str): MLflow experiment name.
+            run_name (str): MLflow run name.
+
+        Yields:
+            RunRecord: Object to log params, metrics and artifacts on.
+        """
+        record = RunRecord(experiment, run_name)
+        try:
+            yield record
+        except BaseException:
+            record.status = "FAILED"
+            raise
+        finally:
+            record.end_ms = _now_ms()
+            self._ensure_writer()
+            self._queue.put(record)
+
+    def flush(self):
+        """Block until every queued run has been written."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def _ensure_writer(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._write_loop, name="tracking-writer", daemon=True)
+                self._thread.start()
+
+    def _write_loop(self):
+        while True:
+            record = self._queue.get()
+            try:
+                self._write(record)
+            except Exception as e:
+                print(f"Tracking write failed for run {record.run_name}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _experiment_id(self, name):
+        if name not in self._experiments:
+            experiment = self._client.get_experiment_by_name(name)
+            self._experiments[name] = (
+                experiment.experiment_id if experiment is not None else self._client.create_experiment(name)
+            )
+        return self._experiments[name]
+
+    def _write(self, record):
+        # Imported here so training code that never tracks does not load MLflow
+        from mlflow.entities import Metric, Param, RunTag
+        from mlflow.tracking import MlflowClient
+
+        if self._client is None:
+            if self.tracking_uri.startswith("file:"):
+                # Newer MLflow releases refuse the file store unless opted in
+                os.environ.setdefault("MLFLOW_ALLOW_FILE_STORE", "true")
+            self._client = MlflowClient(self.tracking_uri)
+        tags = [RunTag("artifact_store", os.path.abspath(self.artifact_store.root))]
+        for path in record.artifacts:
+            # A failed run may have logged an artifact before it was written
+            if record.status == "FAILED" and not os.path.exists(path):
+                continue
+            digest, _, _ = self.artifact_store.put(path)
+            tags.append(RunTag(f"artifact.{os.path.basename(path)}", f"sha256:{digest}"))
+        params = [Param(key, str(value)) for key, value in record.params.items()]
+        metrics = [Metric(key, value, timestamp, step) for key, value, timestamp, step in record.metrics]
+        run = self._client.create_run(
+            self._experiment_id(record.experiment), start_time=record.start_ms, run_name=record.run_name
+        )
+        run_id = run.info.run_id
+        # One log_batch call per chunk instead of one request per value
+        n_batches = max(
+            -(-len(metrics) // MAX_METRICS_PER_BATCH),
+            -(-len(params) // MAX_PARAMS_PER_BATCH),
+            -(-len(tags) // MAX_TAGS_PER_BATCH)
+        )
+        for i in range(n_batches):
+            self._client.log_batch(
+                run_id,
+                metrics=metrics[i * MAX_METRICS_PER_BATCH:(i + 1) * MAX_METRICS_PER_BATCH],
+                params=params[i * MAX_PARAMS_PER_BATCH:(i + 1) * MAX_PARAMS_PER_BATCH],
+                tags=tags[i * MAX_TAGS_PER_BATCH:(i + 1) * MAX_TAGS_PER_BATCH]
+            )
+        self._client.set_terminated(run_id, status=record.status, end_time=record.end_ms)
+
+
+tracker = Tracker()